@@ -1,56 +1,31 @@
-import json
-from huggingface_hub import InferenceClient
 import streamlit as st
-import os
 from dotenv import load_dotenv
-import re
-import docker
-import uuid
-import tempfile
-from sentence_transformers import SentenceTransformer, util
-import time
-import torch
-
 
+# Settings of the modules below are read at import time
 load_dotenv()
-# === Setup Inference Client ===
-client = InferenceClient(provider="fireworks-ai", api_key=os.getenv("hf_token") or st.secrets["hf_token"])
-def query_llm(prompt):
-    # prompt = json.dumps({"messages": messages, "actions": actions or []})
-    try:
-        completion = client.chat.completions.create(
-            model="meta-llama/Llama-3.1-8B-Instruct",
-            messages=[
-                {"role": "system", "content": prompt}
-            ],
-        )
-        return completion.choices[0].message["content"]
-    except:
-        return {'Error generating the question.'}
-
-
-def extract_json(raw_response: str):
-
-    raw = raw_response.strip()
+from Llm_Gateway import chat, stream_chat
+from Json_Stream import IncrementalJSONParser
+from Json_Repair import loads_tolerant
+from Embeddings import encode
+from Lexical_Scorer import prescore, stats as scorer_stats
+from Sandbox import run_tests
+from Question_Bank import get_question_bank
 
-    # Handle markdown code blocks like ```json ... ``` or ``` ...
-    if "```" in raw:
-        _, _, after = raw.partition("```")
-        after = after.strip()
 
-        if after.lower().startswith("json"):
-            after = after[4:].strip()
+def query_llm(prompt):
+    """Single-prompt completion through the shared LLM gateway; errors propagate to the caller."""
+    return chat([{"role": "system", "content": prompt}])
 
-        if after.endswith("```"):
-            after = after[:-3].strip()
 
-        raw = after
-    raw = raw.replace(": None", ": null")
-    # Attempt JSON parsing
+def extract_json(raw_response: str):
+    """
+    Parse the JSON value of an LLM response. Markdown fences, single quotes,
+    Python literals and trailing commas are repaired locally (Json_Repair.py).
+    """
     try:
-        return json.loads(raw)
-    except json.JSONDecodeError as e:
-        print(f"Failed to parse JSON:\n{e}\n\nContent:\n{raw}")
+        return loads_tolerant(raw_response)
+    except ValueError as e:
+        print(f"Failed to parse JSON:\n{e}\n\nContent:\n{raw_response}")
         raise ValueError(f"Error in generating the question please restart the test.")
 
 
@@ -77,7 +52,7 @@ Now generate for topic: {topic}
 
     try:
         raw_response = query_llm(prompt)
-        parsed = json.loads(raw_response)
+        parsed = loads_tolerant(raw_response)
         subtopics = parsed.get("subtopics", [])
 
         # Initialize beliefs in session state
@@ -104,7 +79,42 @@ Now generate for topic: {topic}
         }
  
 
-def generate_question(tag: list,type: str, difficulty: str = "medium"):
+def validate_question(question: dict, type: str):
+    """Raise ValueError if a generated question does not match the template for its type."""
+    if not isinstance(question, dict):
+        raise ValueError("Question is not a JSON object.")
+    if not str(question.get("question", "")).strip():
+        raise ValueError("Question text is missing.")
+    if question.get("type") != type:
+        raise ValueError(f"Expected a {type} question, got {question.get('type')}.")
+    if not isinstance(question.get("time_limit"), (int, float)):
+        raise ValueError("time_limit is missing.")
+
+    if type == "MCQ":
+        if not isinstance(question.get("options"), list) or len(question["options"]) < 2:
+            raise ValueError("MCQ needs at least two options.")
+        if not question.get("correct_answer"):
+            raise ValueError("MCQ correct_answer is missing.")
+    elif type == "ShortAnswer":
+        if not str(question.get("correct_answer", "")).strip():
+            raise ValueError("ShortAnswer correct_answer is missing.")
+    elif type == "Coding":
+        test_cases = question.get("test_cases")
+        if not isinstance(test_cases, list) or not test_cases:
+            raise ValueError("Coding question has no test_cases.")
+        for test in test_cases:
+            if not isinstance(test, dict) or test.get("input") is None or test.get("expected_output") is None:
+                raise ValueError("Coding test case needs input and expected_output.")
+
+
+def mark_question_seen(student_id: str, question: dict):
+    """Record that a student was shown a bank question so it is not served to them again."""
+    bank = get_question_bank()
+    if bank and student_id and question.get("bank_id") is not None:
+        bank.mark_seen(student_id, question["bank_id"])
+
+
+def _question_prompt(tag: list, type: str, difficulty: str) -> str:
     prompt = f"""
 You are a helpful assistant designed to generate **one** Python assessment question based on the given topics and type and difficulty.
 MCQ are option questions where one or more are correct 
@@ -161,19 +171,85 @@ If type == "Coding":
     }}
 
 """
-    
-    # prompt = generate_questions_prompt(tag, difficulty)
+    return prompt
+
+
+def _bank_lookup(tag: list, type: str, difficulty: str, student_id: str, topic: str = None):
+    bank = get_question_bank()
+    if bank and student_id:
+        try:
+            return bank.pick(tag, type, difficulty, student_id, topic=topic)
+        except Exception as e:
+            print(f"Question bank lookup failed: {e}")
+    return None
+
+
+def _bank_store(tag: list, type: str, difficulty: str, question: dict, topic: str = None):
+    """Write a valid generated question back to the bank (sets its "bank_id")."""
+    bank = get_question_bank()
+    if bank:
+        try:
+            validate_question(question, type)
+            question["bank_id"] = bank.add(tag, type, difficulty, question, topic=topic)
+        except Exception as e:
+            print(f"Question not stored in bank: {e}")
+
+
+def generate_question(tag: list,type: str, difficulty: str = "medium", student_id: str = None, topic: str = None):
+    """
+    Returns one question for the tags/type/difficulty.
+    With a `student_id`, a stored question the student has not seen is served from the
+    question bank when enough exist; otherwise the LLM generates one and valid results
+    are written back to the bank. Bank questions are kept per `topic` (the test's subject).
+    """
+    stored = _bank_lookup(tag, type, difficulty, student_id, topic)
+    if stored:
+        return stored
+
+    prompt = _question_prompt(tag, type, difficulty)
     raw_response = ""
     try:
         raw_response = query_llm(prompt)
-        time.sleep(1)
         print(raw_response)
         questions = extract_json(raw_response)
-        return questions
     except Exception as e:
         print(f"Failed to parse LLM response: {e}\nRaw:\n{raw_response}")
         raise ValueError(f"Error in generating the question please restart the test.")
 
+    _bank_store(tag, type, difficulty, questions, topic)
+    return questions
+
+
+def generate_question_stream(tag: list, type: str, difficulty: str = "medium", student_id: str = None,
+                             topic: str = None):
+    """
+    Streaming variant of generate_question. Yields events while the LLM is still writing:
+    - ("partial", key, text) / ("field", key, value) for the question's fields as they arrive
+    - ("done", None, question) once the whole question is parsed
+    A malformed response raises ValueError as soon as it is detected.
+    """
+    stored = _bank_lookup(tag, type, difficulty, student_id, topic)
+    if stored:
+        yield ("done", None, stored)
+        return
+
+    parser = IncrementalJSONParser()
+    stream = stream_chat([{"role": "system", "content": _question_prompt(tag, type, difficulty)}])
+    try:
+        for chunk in stream:
+            yield from parser.feed(chunk)
+            if parser.done:
+                break
+        questions = parser.close()
+    except Exception as e:
+        print(f"Failed to parse streamed LLM response: {e}\nRaw:\n{parser.buffer}")
+        raise ValueError(f"Error in generating the question please restart the test.")
+    finally:
+        stream.close()
+
+    _bank_store(tag, type, difficulty, questions, topic)
+    yield ("done", None, questions)
+
 
 
 def evaluate_mcq(choosen_answer: list, correct_answer: list):
@@ -191,80 +267,76 @@ def evaluate_short_answer(user_answer: str, correct_answer: str) -> int:
     Compares two text answers and returns:
     - 1 if semantic similarity >= 0.5
     - 0 if similarity < 0.5
+    Empty, near-verbatim and unrelated answers are decided lexically (Lexical_Scorer.py);
+    only ambiguous ones reach the embedding model.
     """
-    # Compute embeddings
-    _model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = _model.encode([user_answer, correct_answer], convert_to_tensor=True, device='cpu')
-   
-    # Calculate cosine similarity
-    sim_score = util.pytorch_cos_sim(embeddings[0], embeddings[1]).item()
-   
-    # Debug: print score if needed
-    # print(f"Similarity score: {sim_score:.3f}")
-   
-    return 1 if sim_score >= 0.5 else 0
-
-
-
-def run_code_in_sandbox(code: str, testcases: list):
-    temp_dir = tempfile.gettempdir()
-    client = docker.from_env()
+    return evaluate_short_answers_batch([(user_answer, correct_answer)])[0]
 
-    passed = 0
-    failed = 0
-    errors = []
 
-    for test in testcases:
-        test_input = test["input"]
-        expected_output = str(test["expected_output"]) 
-
-        filename = os.path.join(temp_dir, f"{uuid.uuid4().hex}.py")
-        with open(filename, 'w') as f:
-            f.write(code.strip() + f"\nprint(solution({test_input}))")
-
-        try:
-            result = client.containers.run(
-                image="python:3.10-slim",
-                command=f"python /code/{os.path.basename(filename)}",
-                volumes={temp_dir: {"bind": "/code", "mode": "ro"}},
-                stderr=True,
-                stdout=True,
-                network_disabled=True,
-                remove=True,
-                mem_limit="128m",
-                cpu_quota=50000,
-            )
-            result_str = result.decode().strip()
-            if result_str == expected_output:
-                passed += 1
-            else:
-                failed += 1
-                errors.append({
-                    "input": test_input,
-                    "expected": expected_output,
-                    "got": result_str
-                })
+def evaluate_short_answers_batch(pairs: list) -> list:
+    """
+    Scores many (user_answer, correct_answer) pairs; the ambiguous ones share one encode call.
+    Returns a list of 1/0 in the same order as `pairs`.
+    """
+    if not pairs:
+        return []
+
+    scores = [None] * len(pairs)
+    ambiguous = []   # indexes of pairs graded by the embedding model (undecided or audited)
+    audited = {}     # index -> the lexical verdict the embedding verdict replaces
+    for i, (user, correct) in enumerate(pairs):
+        tier, score = prescore(user, correct)
+        scorer_stats.record(tier)
+        if score is not None and scorer_stats.should_audit(tier):
+            audited[i] = score
+            score = None
+        scores[i] = score
+        if score is None:
+            ambiguous.append(i)
+    if not ambiguous:
+        return scores
+
+    user_answers = [str(pairs[i][0] or "") for i in ambiguous]
+    correct_answers = [str(pairs[i][1] or "") for i in ambiguous]
+
+    # Reference answers repeat across a cohort, so they go through the embedding cache
+    user_embeddings = encode(user_answers)
+    correct_embeddings = encode(correct_answers, use_cache=True)
+
+    # Embeddings are unit length: the row-wise dot product is the cosine similarity
+    sim_scores = (user_embeddings * correct_embeddings).sum(axis=1).tolist()
+
+    # Debug: print scores if needed
+    # print(f"Similarity scores: {sim_scores}")
+
+    for i, sim_score in zip(ambiguous, sim_scores):
+        scores[i] = 1 if sim_score >= 0.5 else 0
+        if i in audited:
+            scorer_stats.record_audit(audited[i] == scores[i])
+    return scores
+
+
+
+def _session_id():
+    """Streamlit session of the caller, used for fair sandbox scheduling across sessions."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else None
+    except Exception:
+        return None
 
-        except Exception as e:
-            failed += 1
-            errors.append({
-                "input": test_input,
-                "error": str(e)
-            })
 
-        # Clean up file
-        try:
-            os.remove(filename)
-        except:
-            pass
-
-    return {
-        "passed": passed,
-        "failed": failed,
-        "total": len(testcases),
-        "details": errors
-    }
-    return passed/len(testcases)
+def run_code_in_sandbox(code: str, testcases: list, max_failures: int = None):
+    """
+    Runs the submitted `solution` against every test case in the configured sandbox
+    (see SANDBOX_BACKEND), with independent cases running in parallel.
+    Per-case and per-submission time limits come from SANDBOX_CASE_TIMEOUT and
+    SANDBOX_SUBMISSION_TIMEOUT. Pass `max_failures` (e.g. 1) to stop early when
+    only a pass/fail verdict is needed.
+    Returns {"passed", "failed", "total", "details"}.
+    """
+    return run_tests(code, testcases, session=_session_id(), max_failures=max_failures)
 
 def update_beliefs(tags: list, score: float):
     for tag in tags:
@@ -280,6 +352,14 @@ def update_beliefs(tags: list, score: float):
 
     return st.session_state.beliefs
 
+def predict_beliefs(beliefs: dict, question_counts: dict, tags: list, score: float):
+    """Beliefs that `update_beliefs(tags, score)` would produce, without touching session state."""
+    predicted = dict(beliefs)
+    for tag in tags:
+        n = question_counts[tag]
+        predicted[tag] = (beliefs[tag] * n + score) / (n + 1)
+    return predicted
+
 def summarize_results(beliefs: dict):
     strong_knowledge = [tag for tag, belief in beliefs.items() if belief > 0.7]
     moderate_knowledge = [tag for tag, belief in beliefs.items() if 0.3 < belief <= 0.7]
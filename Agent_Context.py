@@ -0,0 +1,137 @@
+import json
+import os
+from Agent_Protocol import RESULTS_NAME, has_calls
+from Llm_Gateway import estimate_message_tokens, estimate_tokens
+
+
+# === Agent Context Settings ===
+# Prompt budget for the agent conversation (system prompt + summary + recent turns)
+CONTEXT_TOKENS = int(os.getenv("AGENT_CONTEXT_TOKENS", "3000"))
+# Most recent messages that are always sent verbatim, whatever the budget
+MIN_RECENT = int(os.getenv("AGENT_CONTEXT_MIN_RECENT", "4"))
+# Asked questions and scores listed in the summary (older ones are only counted)
+SUMMARY_QUESTIONS = 15
+QUESTION_PREVIEW_CHARS = 100
+
+
+def _preview(text: str) -> str:
+    first_line = next((line.strip() for line in str(text).splitlines() if line.strip()), "")
+    if len(first_line) > QUESTION_PREVIEW_CHARS:
+        return first_line[:QUESTION_PREVIEW_CHARS - 3] + "..."
+    return first_line
+
+
+class AgentContext:
+    """
+    Bounded conversation for the agent loop.
+
+    The system prompt and the most recent turns are kept verbatim. When the
+    conversation exceeds the token budget, the oldest turns are folded into a
+    running summary (topic, tags, latest beliefs, asked questions, scores)
+    that is sent as a second system message, so the prompt size stays flat
+    however long the session runs.
+    """
+
+    def __init__(self, system_prompt: str, budget: int = CONTEXT_TOKENS, min_recent: int = MIN_RECENT):
+        self.system = {"role": "system", "content": system_prompt}
+        self.budget = budget
+        self.min_recent = min_recent
+        self.recent = []
+        self.topic = None
+        self.tags = []
+        self.beliefs = {}
+        self.questions = []
+        self.scores = []
+        self.compacted = 0
+
+    def append(self, message: dict):
+        self.recent.append(message)
+        self._compact()
+
+    def last(self) -> dict:
+        return self.recent[-1] if self.recent else self.system
+
+    def messages(self) -> list:
+        """The message list sent to the model."""
+        summary = self.summary()
+        head = [self.system] + ([{"role": "system", "content": summary}] if summary else [])
+        return head + self.recent
+
+    def tokens(self) -> int:
+        return estimate_message_tokens(self.messages())
+
+    # === Summary ===
+    def summary(self) -> str:
+        if not self.compacted:
+            return ""
+        lines = [f"Summary of the {self.compacted} earlier messages of this session (compacted):"]
+        if self.topic:
+            lines.append(f"Topic: {self.topic}")
+        if self.tags:
+            lines.append(f"Tags: {', '.join(map(str, self.tags))}")
+        if self.beliefs:
+            lines.append(f"Latest beliefs: {json.dumps(self.beliefs)}")
+        if self.questions:
+            shown = self.questions[-SUMMARY_QUESTIONS:]
+            lines.append(f"Questions already asked ({len(self.questions)}), do not repeat them:")
+            if len(self.questions) > len(shown):
+                lines.append(f"- ... {len(self.questions) - len(shown)} older questions")
+            lines.extend(f"- {question}" for question in shown)
+        if self.scores:
+            shown = self.scores[-SUMMARY_QUESTIONS:]
+            lines.append(f"Scores so far ({len(self.scores)}, latest last): {', '.join(shown)}")
+        return "\n".join(lines)
+
+    def _compact(self):
+        while len(self.recent) > self.min_recent and self.tokens() > self.budget:
+            self._fold(self.recent.pop(0))
+            self.compacted += 1
+
+    def _fold(self, message: dict):
+        """Keep what the agent still needs from a message that leaves the verbatim window."""
+        role = message.get("role")
+        content = message.get("content", "")
+        if role == "assistant" and not has_calls(content):
+            self.questions.append(_preview(content))
+        elif role == "action":
+            self._fold_action(message.get("name"), content)
+
+    def _fold_action(self, name: str, content: str):
+        try:
+            result = json.loads(content)
+        except (TypeError, json.JSONDecodeError):
+            return
+        if name == RESULTS_NAME and isinstance(result, list):
+            # One message carrying every call of a turn (Agent_Protocol.results_message)
+            for entry in result:
+                if isinstance(entry, dict) and "result" in entry:
+                    self._fold_result(entry.get("name"), entry["result"])
+        else:
+            self._fold_result(name, result)
+
+    def _fold_result(self, name: str, result):
+        if name == "generate_tags" and isinstance(result, dict):
+            self.topic = result.get("topic", self.topic)
+            self.tags = result.get("tags", self.tags)
+            self.beliefs = result.get("beliefs", self.beliefs)
+        elif name == "update_beliefs" and isinstance(result, dict):
+            self.beliefs = result
+        elif name == "generate_question":
+            questions = result if isinstance(result, list) else [result]
+            for question in questions:
+                if isinstance(question, dict) and question.get("question"):
+                    self.questions.append(f"[{question.get('type', '?')}] {_preview(question['question'])}")
+        elif name in ("evaluate_mcq", "evaluate_short_answer"):
+            self.scores.append(str(result))
+        elif name == "run_code_in_sandbox" and isinstance(result, dict):
+            self.scores.append(f"{result.get('passed', '?')}/{result.get('total', '?')} tests")
+
+
+def context_stats(context: AgentContext) -> dict:
+    return {
+        "tokens": context.tokens(),
+        "budget": context.budget,
+        "recent_messages": len(context.recent),
+        "compacted_messages": context.compacted,
+        "summary_tokens": estimate_tokens(context.summary()),
+    }
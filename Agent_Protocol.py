@@ -0,0 +1,107 @@
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+
+# === Action Protocol ===
+# An agent turn may request several actions, either as one line per call
+#   CALL: action_name {"param": value}
+# or as a single JSON list
+#   CALLS: [{"name": "action_name", "args": {"param": value}}, ...]
+# Independent calls run concurrently; all results return in one action message.
+ACTION_WORKERS = int(os.getenv("AGENT_ACTION_WORKERS", "4"))
+# Actions that read or write session state run one at a time, in order, on the calling thread
+STATEFUL_ACTIONS = {"generate_tags", "update_beliefs"}
+RESULTS_NAME = "actions"
+
+executor = ThreadPoolExecutor(max_workers=ACTION_WORKERS, thread_name_prefix="agent-action")
+
+_MARKER = re.compile(r"\bCALL(S?):")
+_NAME = re.compile(r"\s*([A-Za-z_]\w*)")
+_decoder = json.JSONDecoder()
+
+
+def has_calls(content: str) -> bool:
+    return bool(_MARKER.search(content or ""))
+
+
+def _decode_at(content: str, pos: int):
+    """JSON value starting at `pos` (after whitespace) and the index just past it."""
+    while pos < len(content) and content[pos].isspace():
+        pos += 1
+    return _decoder.raw_decode(content, pos)
+
+
+def parse_calls(content: str) -> list:
+    """
+    Every action call in an agent reply, as [{"name", "args"}] in order.
+    Returns [] when the reply has no calls; raises ValueError when a call is malformed.
+    """
+    calls = []
+    pos = 0
+    while True:
+        marker = _MARKER.search(content, pos)
+        if not marker:
+            return calls
+        try:
+            if marker.group(1):
+                items, pos = _decode_at(content, marker.end())
+                if not isinstance(items, list):
+                    raise ValueError("CALLS: must be followed by a JSON list")
+                for item in items:
+                    name = (item.get("name") or item.get("action")) if isinstance(item, dict) else None
+                    if not name:
+                        raise ValueError(f"Call without a name: {item!r}")
+                    calls.append({"name": name, "args": item.get("args", {})})
+            else:
+                name = _NAME.match(content, marker.end())
+                if not name:
+                    raise ValueError("CALL: must be followed by an action name")
+                pos = name.end()
+                args = {}
+                rest = content[pos:].lstrip(" \t")
+                if rest[:1] in ("{", "["):
+                    args, pos = _decode_at(content, pos)
+                calls.append({"name": name.group(1), "args": args})
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid arguments after '{marker.group(0)}': {e}")
+
+
+def _invoke(action_map: dict, call: dict) -> dict:
+    name, args = call["name"], call["args"]
+    if name not in action_map:
+        return {"name": name, "error": f"Action '{name}' not recognized."}
+    try:
+        # Call the action function with the parsed args
+        result = action_map[name](**args) if isinstance(args, dict) else action_map[name]()
+        return {"name": name, "result": result}
+    except Exception as e:
+        return {"name": name, "error": f"Error executing action '{name}': {e}"}
+
+
+def execute_calls(calls: list, action_map: dict, wrap=None) -> list:
+    """
+    Run the calls and return one {"name", "result"} or {"name", "error"} entry per call, in order.
+    Stateless calls are submitted to the shared pool first; stateful ones (STATEFUL_ACTIONS)
+    then run sequentially on this thread while the others are in flight.
+    `wrap(fn)` may adapt the worker function, e.g. to attach the caller's context to pool threads.
+    """
+    worker = wrap(_invoke) if wrap else _invoke
+    futures = {
+        i: executor.submit(worker, action_map, call)
+        for i, call in enumerate(calls)
+        if call["name"] not in STATEFUL_ACTIONS
+    }
+    results = [None] * len(calls)
+    for i, call in enumerate(calls):
+        if i not in futures:
+            results[i] = _invoke(action_map, call)
+    for i, future in futures.items():
+        results[i] = future.result()
+    return results
+
+
+def results_message(results: list) -> dict:
+    """The single action message fed back to the agent for a turn's calls."""
+    return {"role": "action", "name": RESULTS_NAME, "content": json.dumps(results, default=str)}
@@ -5,13 +5,20 @@ import streamlit as st
 import time
 import json
 from Actions import *
-from huggingface_hub import InferenceClient
+from Llm_Gateway import chat
 from dotenv import load_dotenv
 import os
+import uuid
 from collections import Counter
 from streamlit_ace import st_ace
 from streamlit_autorefresh import st_autorefresh
 import streamlit.components.v1 as components
+from Prefetch import PREFETCH_WAIT, QuestionPrefetcher
+from Scheduler import choose_next_question
+from Quiz_Pipeline import generate_quiz_stream
+
+# "local" picks the next question with Scheduler.py; "llm" asks the LLM for it
+QUESTION_SCHEDULER = os.getenv("QUESTION_SCHEDULER", "local").strip().lower()
 # Initialize session state
 if "role" not in st.session_state:
     st.session_state.role = None
@@ -44,11 +51,6 @@ if st.session_state.role is None:
 
 if st.session_state.role == "student":
     #--------------------------------------------------------------------------------------------------------
-    # === LLM Client Setup ===
-    load_dotenv()
-    hf_token = os.getenv("hf_token") or st.secrets["hf_token"]
-    client = InferenceClient(provider="fireworks-ai", api_key=hf_token)
-
     # === UI Setup ===
     st.set_page_config(page_title="Intelligent Evaluator", layout="centered")
     load_css()
@@ -71,15 +73,20 @@ if st.session_state.role == "student":
         st.session_state.step = "start"
     if "question_counts" not in st.session_state:
         st.session_state.question_counts = {}
+    if "student_id" not in st.session_state:
+        st.session_state.student_id = uuid.uuid4().hex
+    if "prefetcher" not in st.session_state:
+        st.session_state.prefetcher = QuestionPrefetcher()
 
     def end_test():
+        st.session_state.prefetcher.cancel()
         st.session_state.step = "summarize"
 
     # === LLM Helper ===
-    def call_llm_for_next_question(tags, beliefs, asked_types):
+    # Runs both in the script and in prefetch workers, so it must not touch st.* directly
+    def call_llm_for_next_question(tags, beliefs, asked_types, max_questions):
         type_counts = Counter(asked_types)
         total_asked = len(asked_types)
-        max_questions = st.session_state.max_questions
         mcq_count = type_counts.get("MCQ", 0)
         short_answer_count = type_counts.get("ShortAnswer", 0)
         coding_count = type_counts.get("Coding", 0)
@@ -122,16 +129,53 @@ if st.session_state.role == "student":
         ]
         
         try:
-            response = client.chat.completions.create(
-            model="meta-llama/Llama-3.1-8B-Instruct",
-            messages=messages
-            )
-            return json.loads(response.choices[0].message.content)
+            return json.loads(chat(messages))
         except Exception as e:
             print(f"Failed to parse LLM response: {e}")
-            st.error(f"Error in generating the question please restart the test.")
             return {}
 
+    def decide_next_question(tags, beliefs, asked_types, max_questions, question_counts):
+        if QUESTION_SCHEDULER == "llm":
+            return call_llm_for_next_question(tags, beliefs, asked_types, max_questions)
+        return choose_next_question(tags, beliefs, asked_types, max_questions, question_counts)
+
+    # === Prefetch Helper ===
+    def prefetch_next_question():
+        """While the current question is shown, prepare the next one for a pass and a fail outcome."""
+        tags = st.session_state.tags
+        asked_types = list(st.session_state.asked_types)
+        max_questions = st.session_state.max_questions
+        student_id = st.session_state.student_id
+        topic = st.session_state.topic
+        current_tag = st.session_state.current_tag
+        # Mirrors the submit path, which bumps question_counts before update_beliefs
+        counts = {tag: st.session_state.question_counts[tag] + 1 for tag in current_tag}
+        # Counts after the belief update, for the local scheduler
+        next_counts = {**st.session_state.question_counts, **{tag: n + 1 for tag, n in counts.items()}}
+
+        def produce(beliefs):
+            decision = decide_next_question(tags, beliefs, asked_types, max_questions, next_counts)
+            if not decision:
+                return None
+            q = generate_question(
+                tag=decision["tags"], type=decision["type"], difficulty=decision["difficulty"], student_id=student_id,
+                topic=topic
+            )
+            return decision, q
+
+        branches = {}
+        local_decisions = []
+        for outcome in (1.0, 0.0):
+            predicted = predict_beliefs(st.session_state.beliefs, counts, current_tag, outcome)
+            if QUESTION_SCHEDULER != "llm":
+                # Outcomes that lead the local scheduler to the same decision share one branch
+                local_decision = choose_next_question(tags, predicted, asked_types, max_questions, next_counts)
+                if local_decision in local_decisions:
+                    continue
+                local_decisions.append(local_decision)
+            branches[outcome] = predicted
+        st.session_state.prefetcher.speculate(branches, produce)
+
     # === Step 1: Enter Topic ===
     if st.session_state.step == "start":
         topic = st.text_input("Enter topic to evaluate:", value="Python")
@@ -148,25 +192,59 @@ if st.session_state.role == "student":
                 print(f"Error generating tags: {e}")
                 st.error(f"Error in generating the question please restart the test.")
 
-    # === Step 2: LLM picks tag/type → generate question ===
+    # === Step 2: Scheduler (or LLM) picks tag/type → generate question ===
     elif st.session_state.step == "next_question":
         if st.session_state.question_count >= st.session_state.max_questions:
             st.session_state.step = "summarize"
             st.rerun()
         else:
-            decision = call_llm_for_next_question(
-                tags=st.session_state.tags,
+            # The local scheduler decides in microseconds, so a prefetched question is only
+            # used if it matches that decision; with LLM routing the belief drift decides
+            local_decision = None
+            if QUESTION_SCHEDULER != "llm":
+                local_decision = choose_next_question(
+                    tags=st.session_state.tags,
+                    beliefs=st.session_state.beliefs,
+                    asked_types=st.session_state.get("asked_types", []),
+                    max_questions=st.session_state.max_questions,
+                    question_counts=st.session_state.question_counts
+                )
+            prefetched = st.session_state.prefetcher.take(
+                score=st.session_state.get("last_score", 0.0),
                 beliefs=st.session_state.beliefs,
-                asked_types=st.session_state.get("asked_types", [])
+                decision=local_decision,
+                timeout=PREFETCH_WAIT,
             )
+            if prefetched:
+                decision, q = prefetched
+            else:
+                decision = local_decision or call_llm_for_next_question(
+                    tags=st.session_state.tags,
+                    beliefs=st.session_state.beliefs,
+                    asked_types=st.session_state.get("asked_types", []),
+                    max_questions=st.session_state.max_questions
+                )
+                q = None
             if decision:
                 try:
-                    q = generate_question(
-                        tag=decision["tags"],
-                        type=decision["type"],
-                        difficulty=decision["difficulty"]
-                    )
+                    if q is None:
+                        # Stream the question so its stem shows while options/test cases are still generating
+                        st.subheader(f"Question {st.session_state.question_count + 1}")
+                        stem = st.empty()
+                        stem.markdown("_Preparing your question..._")
+                        for event, key, value in generate_question_stream(
+                            tag=decision["tags"],
+                            type=decision["type"],
+                            difficulty=decision["difficulty"],
+                            student_id=st.session_state.student_id,
+                            topic=st.session_state.topic
+                        ):
+                            if key == "question":
+                                stem.markdown(f"**{value}**")
+                            elif event == "done":
+                                q = value
                     print(q)
+                    mark_question_seen(st.session_state.student_id, q)
                     st.session_state.question = q
                     st.session_state.current_tag = decision["tags"]
                     st.session_state.asked_types.append(decision["type"])
@@ -222,6 +300,12 @@ if st.session_state.role == "student":
         # === Logic Control for Disabling Inputs ===
         time_up = remaining <= 0
 
+        # === Prefetch the next question while this one is answered ===
+        if (st.session_state.get("prefetched_for") != st.session_state.question_count
+                and st.session_state.question_count + 1 < st.session_state.max_questions):
+            st.session_state.prefetched_for = st.session_state.question_count
+            prefetch_next_question()
+
         # === Input Setup ===
         user_answer = None
 
@@ -274,6 +358,7 @@ if st.session_state.role == "student":
 
         if skipped:
             st.session_state.beliefs = update_beliefs(tags=st.session_state.current_tag, score=0.0)
+            st.session_state.last_score = 0.0
             st.success("Question skipped. Moving to the next one.")
             st.session_state.question_count += 1
             st.session_state.flag = True
@@ -301,6 +386,7 @@ if st.session_state.role == "student":
                 st.session_state.step = "next_question"
                 updated = update_beliefs(tags=st.session_state.current_tag, score=score)
                 st.session_state.beliefs = updated
+                st.session_state.last_score = score
                 st.success("Submitted successfully")
                 st.session_state.flag = True
                 st.session_state.pop("question_start_time", None)
@@ -338,18 +424,30 @@ if st.session_state.role == "sme":
         st.markdown("Enter one or more comma-separated URLs to generate a quiz from the content.")
         urls_input = st.text_area("URLs (comma-separated):")
         num_q = st.number_input("Number of questions", min_value=1, max_value=20, value=5)
+        force_refresh = st.checkbox("Force refresh (ignore cached pages)", value=False)
 
         if st.button("Generate Quiz"):
             urls = [u.strip() for u in urls_input.split(",") if u.strip()]
             if not urls:
                 st.warning("Please enter at least one valid URL.")
             else:
+                prep_stats = {}
                 with st.spinner("Scraping websites..."):
-                    content = scrape_multiple(urls)
+                    content = scrape_prepared(urls, force_refresh=force_refresh, stats=prep_stats)
                 try:
                     with st.spinner("Generating quiz using LLM..."):
-                        quiz = call_llm_generate(content, num_questions=num_q)
+                        # Show each question as soon as it has been generated
+                        quiz = []
+                        progress = st.empty()
+                        quiz_stats = {}
+                        for q in generate_quiz_stream(content, num_questions=num_q, stats=quiz_stats):
+                            quiz.append(q)
+                            progress.markdown("\n\n".join(
+                                f"**Q{i}: ({item.get('type')})** {item.get('question')}" for i, item in enumerate(quiz, start=1)
+                            ))
                         st.session_state.quiz = quiz
+                        st.session_state.quiz_stats = quiz_stats
+                        st.session_state.prep_stats = prep_stats
                         st.session_state.step = "quiz"
                         st.rerun()
                 except Exception as e:
@@ -359,6 +457,16 @@ if st.session_state.role == "sme":
     elif st.session_state.step == "quiz":
         st.subheader("Quiz Questions")
         quiz = st.session_state.quiz
+        prep_stats = st.session_state.get("prep_stats")
+        if prep_stats:
+            for url, error in prep_stats.get("failed", []):
+                st.warning(f"Could not scrape {url}: {error}")
+            st.caption(f"Content cleanup: {prep_stats['raw_tokens']} → {prep_stats['final_tokens']} tokens "
+                       f"({prep_stats['tokens_saved']} saved, {prep_stats['saved_ratio']:.0%})")
+        quiz_stats = st.session_state.get("quiz_stats")
+        if quiz_stats:
+            st.caption(f"Sent ~{quiz_stats['prompt_tokens']} of {quiz_stats['content_tokens']} content tokens "
+                       f"to the LLM ({quiz_stats['mode']}, {quiz_stats['calls']} calls)")
 
         for idx, q in enumerate(quiz, start=1):
             st.markdown(f"### Q{idx}: ({q['type']})\n**{q['question']}**")
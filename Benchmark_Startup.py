@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+# === Cold-Start Benchmark ===
+# Runs each Streamlit entry point once per fresh interpreter (bare mode, no
+# server) and reports how long the script takes to import and render its
+# first page, the peak RSS of the process, and which heavy modules it loaded.
+#
+#   python Benchmark_Startup.py [--repeat 5] [--json]
+ENTRY_POINTS = ["App.py", "Mcp_Generator.py", "Intelligent_Evaluator_Agent.py"]
+HEAVY_MODULES = ["torch", "sentence_transformers", "docker", "numpy", "huggingface_hub", "firecrawl"]
+
+# Placeholder keys so entry points do not fall back to st.secrets; nothing is called over the network
+DUMMY_ENV = {"hf_token": "benchmark", "firecrawl_api_key": "benchmark"}
+
+_PROBE = r"""
+import json, resource, runpy, sys, time, warnings
+import logging
+warnings.filterwarnings("ignore")
+logging.disable(logging.WARNING)
+
+def rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+base_rss = rss_mb()
+start = time.perf_counter()
+error = None
+try:
+    runpy.run_path(sys.argv[1], run_name="__main__")
+except SystemExit:
+    pass
+except BaseException as e:
+    error = f"{type(e).__name__}: {e}"
+elapsed = time.perf_counter() - start
+print("__BENCHMARK__" + json.dumps({
+    "seconds": elapsed,
+    "rss_mb": rss_mb(),
+    "base_rss_mb": base_rss,
+    "heavy": [m for m in json.loads(sys.argv[2]) if m in sys.modules],
+    "error": error,
+}))
+"""
+
+
+def measure(entry_point: str) -> dict:
+    """One cold start of `entry_point` in a fresh interpreter."""
+    env = {**os.environ, **{k: os.environ.get(k, v) for k, v in DUMMY_ENV.items()}}
+    proc = subprocess.run(
+        [sys.executable, "-c", _PROBE, entry_point, json.dumps(HEAVY_MODULES)],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("__BENCHMARK__"):
+            return json.loads(line[len("__BENCHMARK__"):])
+    return {"seconds": None, "rss_mb": None, "base_rss_mb": None, "heavy": [],
+            "error": (proc.stderr.strip().splitlines() or ["no output"])[-1]}
+
+
+def benchmark(entry_points: list, repeat: int) -> dict:
+    report = {}
+    for entry_point in entry_points:
+        runs = [measure(entry_point) for _ in range(repeat)]
+        ok = [r for r in runs if r["seconds"] is not None]
+        report[entry_point] = {
+            "median_seconds": statistics.median(r["seconds"] for r in ok) if ok else None,
+            "max_rss_mb": max(r["rss_mb"] for r in ok) if ok else None,
+            "interpreter_rss_mb": ok[0]["base_rss_mb"] if ok else None,
+            "heavy_modules": runs[-1]["heavy"],
+            "error": runs[-1]["error"],
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import time and RSS of each entry point.")
+    parser.add_argument("entry_points", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--repeat", type=int, default=3, help="cold starts per entry point (median is reported)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = benchmark(args.entry_points, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'entry point':<34}{'seconds':>9}{'RSS MB':>9}  heavy modules loaded")
+    for entry_point, row in report.items():
+        seconds = f"{row['median_seconds']:.2f}" if row["median_seconds"] is not None else "-"
+        rss = f"{row['max_rss_mb']:.0f}" if row["max_rss_mb"] is not None else "-"
+        print(f"{entry_point:<34}{seconds:>9}{rss:>9}  {', '.join(row['heavy_modules']) or '-'}")
+        if row["error"]:
+            print(f"    error: {row['error']}")
+
+
+if __name__ == "__main__":
+    main()
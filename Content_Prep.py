@@ -0,0 +1,211 @@
+import hashlib
+import os
+import re
+from collections import Counter
+from Llm_Gateway import estimate_tokens
+
+
+# === Content Preparation ===
+# Scraped pages are cleaned before they reach a prompt:
+# 1. boilerplate lines (navigation, cookie banners, footers, lines repeated across sources) are dropped
+# 2. near-identical paragraphs across sources are dropped (word shingles + MinHash/LSH)
+# 3. what remains is trimmed to a token budget, taking paragraphs from every source in turn
+# Content far beyond the budget is cut to PRETRIM_FACTOR x budget before step 2, so the
+# (pure Python) MinHash pass never runs over text that could not be kept anyway.
+TOKEN_BUDGET = int(os.getenv("CONTENT_TOKEN_BUDGET", "12000"))
+# Estimated Jaccard similarity from which two paragraphs count as duplicates
+DUPLICATE_THRESHOLD = float(os.getenv("CONTENT_DUPLICATE_THRESHOLD", "0.8"))
+SHINGLE_WORDS = 5
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16   # 16 bands x 4 rows: candidate pairs from roughly 0.5 similarity up
+REPEATED_LINE_MAX_WORDS = 12
+PRETRIM_FACTOR = 2
+# Share of a short line's words that ambiguous boilerplate phrases must exceed for the line to be dropped
+BOILERPLATE_COVERAGE = 0.5
+
+# Banner and footer phrases that never occur in tutorial prose: a whole-word match drops the line
+BOILERPLATE_PATTERNS = re.compile(
+    r"(©|\bcopyright\b)( \d{4})?|\b((we|this (site|website)) uses? cookies|cookie (policy|settings|preferences)"
+    r"|accept (all )?cookies|accept all|privacy policy|terms of (use|service)|all rights reserved"
+    r"|subscribe to (our|the) newsletter|skip to (main )?content|back to top"
+    r"|was this (page|article) helpful|edit (this page|this article|on github))\b",
+    re.I,
+)
+# Menu items that are also ordinary words in docs ("Sign in with OAuth", "Subscribe to events"):
+# they only drop a short line when they make up most of it
+AMBIGUOUS_BOILERPLATE_PATTERNS = re.compile(
+    r"\b(cookies?|subscribe( to (our|the))?|newsletter|sign in|log in|sign up"
+    r"|share (this|on)|follow us( on)?|table of contents|previous\s*(page|article)?\s*next)\b",
+    re.I,
+)
+_MARKDOWN_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_WORD = re.compile(r"\w+")
+
+_MERSENNE = (1 << 61) - 1
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE | 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE)
+    for i in range(NUM_PERMUTATIONS)
+]
+
+
+def _is_boilerplate_line(line: str) -> bool:
+    text = _MARKDOWN_LINK.sub(r"\1", line).strip(" \t-*#|>")
+    words = _WORD.findall(text)
+    if not words:
+        return True
+    if BOILERPLATE_PATTERNS.search(text):
+        return True
+    if len(words) <= REPEATED_LINE_MAX_WORDS:
+        # Most of the line: "Sign in with OAuth" is a heading, not a menu item
+        matched = sum(len(_WORD.findall(m.group(0))) for m in AMBIGUOUS_BOILERPLATE_PATTERNS.finditer(text))
+        if matched > BOILERPLATE_COVERAGE * len(words):
+            return True
+    # Link lists and breadcrumbs: mostly links, little prose
+    links = len(_MARKDOWN_LINK.findall(line))
+    return links >= 2 and len(words) <= links * 4
+
+
+def split_paragraphs(text: str) -> list:
+    """[(lines, is_code)] split at blank lines; a fenced code block is one paragraph, blank lines included."""
+    paragraphs, current, in_fence = [], [], False
+    for line in text.splitlines():
+        if line.strip().startswith("```"):
+            if not in_fence and current:
+                paragraphs.append((current, False))
+                current = []
+            current.append(line)
+            if in_fence:
+                paragraphs.append((current, True))
+                current = []
+            in_fence = not in_fence
+        elif in_fence:
+            current.append(line)
+        elif line.strip():
+            current.append(line)
+        elif current:
+            paragraphs.append((current, False))
+            current = []
+    if current:
+        paragraphs.append((current, in_fence))
+    return paragraphs
+
+
+def strip_boilerplate(sources: list) -> list:
+    """
+    sources: [(url, text)]. Drops boilerplate lines and short lines that recur in several
+    sources (shared headers, menus, footers); code blocks are kept as they are.
+    Returns [(url, [paragraph, ...])].
+    """
+    split = [(url, split_paragraphs(text)) for url, text in sources]
+    line_sources = Counter()
+    for _, paragraphs in split:
+        line_sources.update({line.strip() for lines, is_code in paragraphs if not is_code for line in lines})
+
+    cleaned = []
+    for url, paragraphs in split:
+        kept_paragraphs = []
+        for lines, is_code in paragraphs:
+            kept = lines if is_code else [
+                line for line in lines
+                if not _is_boilerplate_line(line)
+                and not (len(sources) > 1 and line_sources[line.strip()] > 1
+                         and len(_WORD.findall(line)) <= REPEATED_LINE_MAX_WORDS)
+            ]
+            if kept:
+                kept_paragraphs.append("\n".join(kept))
+        cleaned.append((url, kept_paragraphs))
+    return cleaned
+
+
+def _shingles(paragraph: str) -> set:
+    words = [w.lower() for w in _WORD.findall(paragraph)]
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash(paragraph: str) -> tuple:
+    """MinHash signature of a paragraph's word shingles (NUM_PERMUTATIONS values)."""
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in _shingles(paragraph)]
+    if not hashes:
+        return ()
+    return tuple(min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def _similarity(sig_a: tuple, sig_b: tuple) -> float:
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERMUTATIONS
+
+
+def dedupe_paragraphs(sources: list) -> list:
+    """Drops paragraphs that nearly duplicate an earlier one (in any source); keeps the first."""
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    buckets = {}
+    signatures = []
+    deduped = []
+    for url, paragraphs in sources:
+        kept = []
+        for paragraph in paragraphs:
+            signature = minhash(paragraph)
+            if not signature:
+                continue
+            bands = [(band, signature[band * rows:(band + 1) * rows]) for band in range(LSH_BANDS)]
+            candidates = {i for key in bands for i in buckets.get(key, ())}
+            if any(_similarity(signature, signatures[i]) >= DUPLICATE_THRESHOLD for i in candidates):
+                continue
+            for key in bands:
+                buckets.setdefault(key, []).append(len(signatures))
+            signatures.append(signature)
+            kept.append(paragraph)
+        deduped.append((url, kept))
+    return deduped
+
+
+def trim_to_budget(sources: list, budget: int = TOKEN_BUDGET) -> list:
+    """Keeps paragraphs within `budget` estimated tokens, taking one from each source in turn."""
+    keep = [[False] * len(paragraphs) for _, paragraphs in sources]
+    used = 0
+    position = 0
+    remaining = True
+    while remaining:
+        remaining = False
+        for s, (_, paragraphs) in enumerate(sources):
+            if position >= len(paragraphs):
+                continue
+            remaining = True
+            tokens = estimate_tokens(paragraphs[position])
+            if used + tokens <= budget:
+                keep[s][position] = True
+                used += tokens
+        position += 1
+    return [(url, [p for p, k in zip(paragraphs, keep[s]) if k]) for s, (url, paragraphs) in enumerate(sources)]
+
+
+def _tokens(sources: list) -> int:
+    return sum(estimate_tokens(p) for _, paragraphs in sources for p in paragraphs)
+
+
+def prepare_sources(sources: list, budget: int = TOKEN_BUDGET, stats: dict = None) -> list:
+    """
+    sources: [(url, raw text)] -> [(url, cleaned text)] after boilerplate removal,
+    cross-source near-duplicate removal (over at most PRETRIM_FACTOR x budget tokens)
+    and trimming to `budget` tokens.
+    Pass a dict as `stats` to receive the token count after each stage and the tokens saved.
+    """
+    raw_tokens = sum(estimate_tokens(text) for _, text in sources)
+    cleaned = strip_boilerplate(sources)
+    pretrimmed = trim_to_budget(cleaned, budget * PRETRIM_FACTOR)
+    deduped = dedupe_paragraphs(pretrimmed)
+    trimmed = trim_to_budget(deduped, budget)
+    if stats is not None:
+        final_tokens = _tokens(trimmed)
+        stats.update({
+            "raw_tokens": raw_tokens,
+            "after_boilerplate": _tokens(cleaned),
+            "after_pretrim": _tokens(pretrimmed),
+            "after_dedupe": _tokens(deduped),
+            "final_tokens": final_tokens,
+            "tokens_saved": raw_tokens - final_tokens,
+            "saved_ratio": (raw_tokens - final_tokens) / raw_tokens if raw_tokens else 0.0,
+        })
+    return [(url, "\n\n".join(paragraphs)) for url, paragraphs in trimmed]
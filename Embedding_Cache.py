@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def content_key(text: str, model_name: str) -> str:
+    """Stable cache key for a text embedded with a given model."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class _FileLock:
+    """Exclusive lock shared by every process writing the same cache directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = None
+
+    def __enter__(self):
+        self._fh = open(self.path, "a+b")
+        if fcntl:
+            fcntl.flock(self._fh, fcntl.LOCK_EX)
+        else:
+            self._fh.seek(0)
+            msvcrt.locking(self._fh.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+        else:
+            self._fh.seek(0)
+            msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+        self._fh.close()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by content hash and model name.
+
+    - Memory tier: per-process LRU of recently used vectors.
+    - Disk tier: append-only float32 matrix (`vectors.f32`, read through a
+      memory map) plus an append-only `index.jsonl` mapping keys to rows, so
+      restarts and other worker processes reuse vectors without recomputing.
+    """
+
+    def __init__(self, model_name: str, cache_dir: str, lru_size: int = 2048):
+        self.model_name = model_name
+        self.dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        os.makedirs(self.dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.index_path = os.path.join(self.dir, "index.jsonl")
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.lock_path = os.path.join(self.dir, "cache.lock")
+
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._index = {}          # key -> row in vectors.f32
+        self._index_offset = 0    # bytes of index.jsonl already loaded
+        self._dim = None
+        self._matrix = None       # np.memmap over vectors.f32
+        self._matrix_rows = 0
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    # === Public API ===
+    def get_or_compute(self, texts: list, compute_fn):
+        """
+        Return a float32 matrix with one row per text. Vectors missing from
+        both tiers are computed with a single `compute_fn(missing_texts)` call.
+        """
+        keys = [content_key(t, self.model_name) for t in texts]
+        vectors = [None] * len(texts)
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._lru.get(key)
+                if vec is not None:
+                    self._lru.move_to_end(key)
+                    vectors[i] = vec
+                    self.hits_memory += 1
+
+            missing = [i for i, vec in enumerate(vectors) if vec is None]
+            if missing:
+                found = self._disk_get({keys[i] for i in missing})
+                for i in missing:
+                    if keys[i] in found:
+                        vectors[i] = found[keys[i]]
+                        self.hits_disk += 1
+                        self._lru_put(keys[i], vectors[i])
+
+        missing = [i for i, vec in enumerate(vectors) if vec is None]
+        if missing:
+            # Encode each distinct missing text once
+            unique = list(OrderedDict((keys[i], texts[i]) for i in missing).items())
+            computed = np.asarray(compute_fn([text for _, text in unique]), dtype=np.float32)
+            by_key = {key: computed[j] for j, (key, _) in enumerate(unique)}
+
+            with self._lock:
+                self.misses += len(missing)
+                for key, vec in by_key.items():
+                    self._lru_put(key, vec)
+            self._disk_put(by_key)
+
+            for i in missing:
+                vectors[i] = by_key[keys[i]]
+
+        return np.vstack(vectors) if vectors else np.zeros((0, self._dim or 0), dtype=np.float32)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process."""
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+            "disk_entries": len(self._index),
+        }
+
+    # === Memory Tier ===
+    def _lru_put(self, key: str, vec):
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    # === Disk Tier ===
+    def _load_dim(self):
+        if self._dim is None and os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self._dim = json.load(f)["dim"]
+        return self._dim
+
+    def _refresh_index(self):
+        """Pick up rows appended by this or other processes since the last read."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        # Only consume complete lines; a writer may be mid-append
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                self._index[entry["key"]] = entry["row"]
+        self._index_offset += end
+
+    def _rows(self):
+        return max(self._index.values()) + 1 if self._index else 0
+
+    def _disk_get(self, keys: set) -> dict:
+        self._refresh_index()
+        wanted = {key: self._index[key] for key in keys if key in self._index}
+        if not wanted or self._load_dim() is None:
+            return {}
+
+        rows = self._rows()
+        if self._matrix is None or self._matrix_rows < rows:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim))
+            self._matrix_rows = rows
+        return {key: np.array(self._matrix[row]) for key, row in wanted.items()}
+
+    def _disk_put(self, by_key: dict):
+        if not by_key:
+            return
+        try:
+            with _FileLock(self.lock_path):
+                with self._lock:
+                    self._refresh_index()
+                    new = {key: vec for key, vec in by_key.items() if key not in self._index}
+                if not new:
+                    return
+
+                dim = len(next(iter(new.values())))
+                if self._load_dim() is None:
+                    with open(self.meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"model": self.model_name, "dim": dim}, f)
+                    self._dim = dim
+
+                # Rows are derived from the vector file size so a crash between
+                # the two appends only leaves an unreferenced row behind.
+                start = os.path.getsize(self.vectors_path) // (4 * self._dim) if os.path.exists(self.vectors_path) else 0
+                with open(self.vectors_path, "ab") as f:
+                    for vec in new.values():
+                        f.write(np.asarray(vec, dtype=np.float32).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(self.index_path, "ab") as f:
+                    for row, key in enumerate(new, start=start):
+                        f.write((json.dumps({"key": key, "row": row}) + "\n").encode("utf-8"))
+        except OSError as e:
+            # The memory tier still works if the cache directory is unavailable
+            print(f"Embedding cache write failed: {e}")
@@ -0,0 +1,58 @@
+import os
+import threading
+
+
+# === Shared Embedding Model ===
+# Loading the transformer takes seconds, so it is built once per process and
+# shared by every Streamlit session and thread. sentence_transformers (and
+# torch/numpy with it) is only imported on the first encode, so pages that
+# never grade short answers do not pay for it.
+MODEL_NAME = "all-MiniLM-L6-v2"
+CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(".cache", "embeddings"))
+CACHE_LRU_SIZE = int(os.getenv("EMBEDDING_CACHE_LRU_SIZE", "2048"))
+
+_model = None
+_cache = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Return the process-wide SentenceTransformer, loading it on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(MODEL_NAME, device="cpu")
+    return _model
+
+
+def get_cache():
+    """Return the process-wide embedding cache for MODEL_NAME."""
+    global _cache
+    if _cache is None:
+        with _model_lock:
+            if _cache is None:
+                from Embedding_Cache import EmbeddingCache
+                _cache = EmbeddingCache(MODEL_NAME, CACHE_DIR, lru_size=CACHE_LRU_SIZE)
+    return _cache
+
+
+def _encode_uncached(texts: list):
+    return get_model().encode(texts, convert_to_numpy=True, normalize_embeddings=True, device="cpu")
+
+
+def encode(texts: list, use_cache: bool = False):
+    """
+    Encode a list of texts in a single forward pass.
+    Returns a float32 matrix of unit-length rows, so a dot product is the cosine similarity.
+    Set `use_cache` for texts that repeat across requests (e.g. reference answers).
+    """
+    if use_cache:
+        return get_cache().get_or_compute(texts, _encode_uncached)
+    return _encode_uncached(texts)
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the embedding cache."""
+    return get_cache().stats()
@@ -1,17 +1,19 @@
 import streamlit as st
+import streamlit.components.v1 as components
+import hashlib
 import json
+import threading
 import time
-from huggingface_hub import InferenceClient
-from streamlit_autorefresh import st_autorefresh
+from Llm_Gateway import chat
 from Actions import *
+from Agent_Context import AgentContext
+from Agent_Protocol import execute_calls, has_calls, parse_calls, results_message
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from dotenv import load_dotenv
 import os
 import streamlit as st
 
-# === Fireworks.ai client setup ===
 load_dotenv()
-hf_token = os.getenv("hf_token") or st.secrets["hf_token"]
-client = InferenceClient(provider="fireworks-ai", api_key=hf_token)
 
 # === Action Map ===
 action_map = {
@@ -41,11 +43,7 @@ action_map = {
 
 def call_llm_agent(messages, actions=None):
     # prompt = json.dumps({"messages": messages, "actions": actions or []})
-    completion = client.chat.completions.create(
-        model="meta-llama/Llama-3.1-8B-Instruct",
-        messages=messages
-    )
-    return completion.choices[0].message
+    return chat(messages)
 
 # === Utility ===
 def clear_user_input():
@@ -76,7 +74,8 @@ You have the ability to call the following actions to assist in evaluation:
 
 4. evaluate_short_answer(user_answer: str, correct_answer: str) → returns similarity score string (0.000 to 1.000)
 
-5. run_code_in_sandbox(code: str, testcases: list) → returns test result summary with pass/fail counts and errors
+5. run_code_in_sandbox(code: str, testcases: list, max_failures: int = None) → returns test result summary with pass/fail counts and errors
+   - Set max_failures to stop after that many failed test cases when only a pass/fail verdict is needed.
 
 6. update_beliefs(tags: list, score: float) → returns updated belief scores dict
 
@@ -86,108 +85,131 @@ When you want to call an action, respond exactly in this format:
 
 CALL: action_name {"param1": value1, "param2": value2, ...}
 
-Do NOT include any markdown or commentary around the action call. Only use CALL when you need the result to continue.
-"""
-
-if "messages" not in st.session_state:
-    st.session_state.messages = [
-        {
-            "role": "system",
-            "content": action_instruction_prompt.strip()
-        }
-    ]
+You may put several CALL lines in one response, one per line. Request all independent actions you need
+in the same response (for example generating several questions, or grading several answers); they run
+concurrently and all results come back together in one action message as a JSON list of
+{"name": ..., "result": ...} or {"name": ..., "error": ...} entries, in the order of your calls.
+Do not combine calls that depend on each other's results in one response.
 
+Do NOT include any markdown or commentary around the action calls. Only use CALL when you need the result to continue.
+"""
 
-if "action_results" not in st.session_state:
-    st.session_state.action_results = []
+# The conversation is bounded: older turns are compacted into a summary (Agent_Context.py)
+if "context" not in st.session_state:
+    st.session_state.context = AgentContext(action_instruction_prompt.strip())
 
 # === Start Assessment ===
 if "started" not in st.session_state:
     topic = st.text_input("Enter the topic to evaluate:", "Python")
     if st.button("Start Assessment"):
         st.session_state.started = True
-        st.session_state.messages.append({"role": "user", "content": f"Start evaluating the topic: {topic}"})
+        st.session_state.context.append({"role": "user", "content": f"Start evaluating the topic: {topic}"})
         st.rerun()
 
+# === Agent Turn ===
+def conversation_key(messages: list) -> str:
+    """Hash of the conversation state the agent is asked to respond to."""
+    payload = json.dumps(messages, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def agent_turn(messages: list) -> str:
+    """The assistant reply for this conversation state; the LLM is called once per state."""
+    key = conversation_key(messages)
+    if st.session_state.get("agent_turn_key") != key:
+        st.session_state.agent_turn_content = call_llm_agent(messages)
+        st.session_state.agent_turn_key = key
+    return st.session_state.agent_turn_content
+
+
+def with_script_context(fn):
+    """Attach this session's Streamlit context to the pool thread running `fn` (fair sandbox scheduling)."""
+    ctx = get_script_run_ctx()
+
+    def run(*args, **kwargs):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args, **kwargs)
+    return run
+
+
+def run_actions(content: str) -> dict:
+    """Execute every action call in the reply and return one action message with all results."""
+    try:
+        calls = parse_calls(content)
+    except ValueError as e:
+        return results_message([{"name": "parse", "error": f"Failed to parse action call: {e}"}])
+    return results_message(execute_calls(calls, action_map, wrap=with_script_context))
+
+
 # === Assessment Flow ===
+# Reruns (widget clicks, the countdown) only re-render; the model is queried
+# when the conversation ends with new user or action input. The prompt is the
+# bounded context: system prompt, summary of older turns, recent turns.
 if st.session_state.get("started", False):
-    # Refresh every second to update countdown
-    st_autorefresh(interval=1000, limit=None, key="timer_refresh")
-
-    llm_response = call_llm_agent(st.session_state.messages)
-    content = llm_response.content or ""
+    context = st.session_state.context
+    if context.last()["role"] != "assistant":
+        try:
+            content = agent_turn(context.messages())
+        except Exception as e:
+            st.error(f"Error getting a response from the evaluator: {e}")
+            st.stop()
+
+        context.append({"role": "assistant", "content": content})
+        if has_calls(content):
+            st.chat_message("ai").write(content)
+            with st.spinner("Running actions..."):
+                context.append(run_actions(content))
+            st.rerun()
+
+    content = context.last()["content"]
     st.chat_message("ai").write(content)
 
-    try:
-        # Check for action call
-        if "CALL:" in content:
-            print("here")
-            try:
-                _, rest = content.split("CALL:")
-                action_name, args_json = rest.strip().split(" ", 1)
-                action_name = action_name.strip()
-                args = json.loads(args_json)
-                if action_name in action_map:
-                    try:
-                        # Call the action function with the parsed args
-                        result = action_map[action_name](**args) if isinstance(args, dict) else action_map[action_name]()
-
-                        # Store the result
-                        st.session_state.action_results.append({action_name: result})
-
-                        # Add the assistant message and action response message
-                        st.session_state.messages.append({"role": "assistant", "content": content})
-                        st.session_state.messages.append({
-                            "role": "action",
-                            "name": action_name,
-                            "content": json.dumps(result)
-                        })
-
-                    except Exception as e:
-                        st.error(f"Error executing action '{action_name}': {e}")
-                else:
-                    st.error(f"Action '{action_name}' not recognized.")
-            except Exception as e:
-                st.error(f"Failed to parse action call: {e}")
-        else:
-            # Display question and handle answer
-            st.session_state.messages.append({"role": "assistant", "content": content})
-
-            if "user_answer" not in st.session_state:
-                st.session_state.user_answer = ""
-
-            if st.session_state.get("clear_input_next", False):
-                clear_user_input()
-                st.session_state.clear_input_next = False
-
-            # Start timer for question
-            if "question_start_time" not in st.session_state:
-                st.session_state.question_start_time = time.time()
-
-            # Show countdown
-            time_limit = 60
-            elapsed = time.time() - st.session_state.question_start_time
-            remaining_time = max(0, int(time_limit - elapsed))
-            st.info(f"⏳ Time remaining: {remaining_time} seconds")
-
-            if remaining_time == 0:
-                st.error("⏰ Time's up! This answer will not be evaluated.")
-
-            # Input and submission
-            user_answer = st.text_input("Your Answer:", value="", key="user_answer_input")
-            if st.button("Submit Answer"):
-                if user_answer.strip():
-                    time_taken = time.time() - st.session_state.question_start_time
-                    if time_taken > time_limit:
-                        st.warning("⏰ Time limit exceeded! This answer will not be evaluated.")
-                    else:
-                        st.session_state.messages.append({"role": "user", "content": user_answer.strip()})
-                    st.session_state.clear_input_next = True
-                    st.session_state.pop("question_start_time", None)
-                    st.rerun()
-
-    except Exception as e:
-        st.error(f"Error parsing action call or response: {e}")
+    # Display question and handle answer
+    if st.session_state.get("clear_input_next", False):
+        clear_user_input()
+        st.session_state.clear_input_next = False
+
+    # Start timer for question
+    if "question_start_time" not in st.session_state:
+        st.session_state.question_start_time = time.time()
+
+    time_limit = 60
+    elapsed = time.time() - st.session_state.question_start_time
+    remaining_time = max(0, int(time_limit - elapsed))
+
+    # === JavaScript Countdown Timer (ticks in the browser, no reruns) ===
+    components.html(f"""
+        <div id="timer" style="font-size:20px; color:#336699; margin-bottom: 10px;"></div>
+        <script>
+        let countdown = {remaining_time};
+        let timerElement = document.getElementById("timer");
+
+        function updateTimer() {{
+            timerElement.innerHTML = "⏳ Time remaining: " + countdown + " seconds";
+            countdown--;
+            if (countdown < 0) {{
+            timerElement.innerHTML = "⏰ Time's up! This answer will not be evaluated.";
+            clearInterval(timer);
+            }}
+        }}
+        updateTimer();
+        let timer = setInterval(updateTimer, 1000);
+        </script>
+    """, height=50)
+
+    # Input and submission
+    user_answer = st.text_input("Your Answer:", value="", key="user_answer_input")
+    if st.button("Submit Answer"):
+        if user_answer.strip():
+            time_taken = time.time() - st.session_state.question_start_time
+            if time_taken > time_limit:
+                # The late answer is not evaluated; tell the agent so it moves on
+                context.append({"role": "user", "content": "Time limit exceeded, no answer submitted."})
+            else:
+                context.append({"role": "user", "content": user_answer.strip()})
+            st.session_state.clear_input_next = True
+            st.session_state.pop("question_start_time", None)
+            st.rerun()
 
 
 
@@ -0,0 +1,148 @@
+import json
+import re
+
+
+# === Tolerant JSON Parsing ===
+# Local fixes for the defects small models commonly produce, so a response is
+# only re-requested when the content itself is missing or invalid:
+# - ```json fences and prose around the value
+# - single-quoted strings
+# - Python literals (None / True / False)
+# - trailing commas before } or ]
+# - a truncated array (complete items are kept)
+PYTHON_LITERALS = {"None": "null", "True": "true", "False": "false"}
+_BARE_WORD = re.compile(r"[A-Za-z_]\w*")
+
+
+def strip_fences(text: str) -> str:
+    """The text inside a ``` / ```json fence, or the text itself when there is none."""
+    text = text.strip()
+    if "```" in text:
+        _, _, after = text.partition("```")
+        after = after.strip()
+        if after.lower().startswith("json"):
+            after = after[4:]
+        text = after.split("```", 1)[0].strip()
+    return text
+
+
+def repair(text: str) -> str:
+    """Rewrite single quotes, Python literals and trailing commas into valid JSON syntax."""
+    out = []
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch == '"' or ch == "'":
+            # Copy a string, re-quoting single-quoted ones with double quotes
+            quote = ch
+            i += 1
+            chars = []
+            while i < n and text[i] != quote:
+                if text[i] == "\\" and i + 1 < n:
+                    escaped = text[i + 1]
+                    chars.append(escaped if quote == "'" and escaped == "'" else text[i:i + 2])
+                    i += 2
+                    continue
+                chars.append('\\"' if text[i] == '"' and quote == "'" else text[i])
+                i += 1
+            out.append('"' + "".join(chars) + '"')
+            i += 1
+        elif ch == ",":
+            # Drop a comma that only precedes a closing bracket
+            j = i + 1
+            while j < n and text[j].isspace():
+                j += 1
+            if j >= n or text[j] not in "}]":
+                out.append(ch)
+            i += 1
+        elif ch.isalpha() or ch == "_":
+            word = _BARE_WORD.match(text, i).group(0)
+            out.append(PYTHON_LITERALS.get(word, word))
+            i += len(word)
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)
+
+
+def _value_span(text: str) -> str:
+    """From the first { or [ onwards (prose before the value is dropped)."""
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    return text[min(starts):] if starts else text
+
+
+def loads_tolerant(text: str):
+    """json.loads, falling back to the local repairs above; raises ValueError if still invalid."""
+    text = strip_fences(text)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(repair(_value_span(text)))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON after repair: {e}")
+
+
+def _split_array(text: str) -> tuple:
+    """Top-level element texts of a (possibly truncated) JSON array and whether it was closed."""
+    start = text.find("[")
+    if start == -1:
+        return [], False
+    elements = []
+    depth = 0
+    in_string = False
+    escape = False
+    element_start = start + 1
+    for i in range(start + 1, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            if depth == 0:
+                if ch == "]":
+                    elements.append(text[element_start:i])
+                    return elements, True
+            else:
+                depth -= 1
+        elif ch == "," and depth == 0:
+            elements.append(text[element_start:i])
+            element_start = i + 1
+    elements.append(text[element_start:])
+    return elements, False
+
+
+def salvage_array(text: str) -> tuple:
+    """
+    (valid items, number of broken items) from a JSON array response.
+    Every element that parses (after repair) is kept; broken and truncated ones are counted.
+    """
+    repaired = repair(_value_span(strip_fences(text)))
+    if repaired.startswith("{"):
+        # An object instead of an array: one item, or a wrapper like {"questions": [...]}
+        try:
+            value = json.loads(repaired)
+        except json.JSONDecodeError:
+            return [], 1
+        lists = [v for v in value.values() if isinstance(v, list)]
+        return (lists[0], 0) if len(lists) == 1 and all(isinstance(v, dict) for v in lists[0]) else ([value], 0)
+    elements, _ = _split_array(repaired)
+    items, broken = [], 0
+    for element in elements:
+        if not element.strip():
+            continue
+        try:
+            items.append(json.loads(element))
+        except json.JSONDecodeError:
+            broken += 1
+    return items, broken
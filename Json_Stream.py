@@ -0,0 +1,168 @@
+import json
+import re
+from Json_Repair import repair
+
+
+_PARTIAL_STRING_MEMBER = re.compile(r'^\s*"((?:[^"\\]|\\.)*)"\s*:\s*"((?:[^"\\]|\\.)*)$', re.S)
+
+
+def _decode_partial_string(body: str) -> str:
+    """Decode the body of a JSON string that has not been closed yet."""
+    # Drop a dangling escape so the prefix is always decodable
+    if re.search(r'(?<!\\)(\\\\)*\\(u[0-9a-fA-F]{0,3})?$', body):
+        body = body[:body.rfind("\\")]
+    try:
+        return json.loads(f'"{body}"')
+    except json.JSONDecodeError:
+        return body
+
+
+def _loads(text: str):
+    try:
+        return json.loads(text.replace(": None", ": null"))
+    except json.JSONDecodeError:
+        # Single quotes, Python literals, trailing commas (Json_Repair.py)
+        return json.loads(repair(text))
+
+
+class IncrementalJSONParser:
+    """
+    Parses a streamed JSON object or array chunk by chunk.
+
+    `feed(chunk)` returns the events that became available:
+    - ("field", key, value)   a top-level object member is complete
+    - ("item", index, value)  a top-level array element is complete
+    - ("partial", key, text)  a top-level string member is still streaming (text so far)
+
+    Text before the top-level value and after its closing bracket is ignored.
+    Inside a ``` / ```json fence the first "{" or "[" starts the value; outside
+    one a bracket only does when JSON follows it ({"  [{  ["  [1 ...), so
+    prose like "Here is [one] question:" is skipped. Broken structure (a mismatched bracket or a
+    member that is not valid JSON) raises ValueError as soon as it is seen,
+    without waiting for the rest of the stream.
+    """
+
+    OPENERS = {"{": "}", "[": "]"}
+    FENCE = "```"
+    # What may follow an opening bracket for it to start the top-level value
+    OBJECT_STARTS = "\"'}"
+    ARRAY_STARTS = "{[\"']-0123456789"
+    ARRAY_WORDS = ("true", "false", "null", "True", "False", "None")
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.root = None          # "{" or "[" once the top-level container starts
+        self.result = None        # dict or list being assembled
+        self.member_start = None  # buffer index where the current top-level member starts
+        self.done = False
+        self.in_fence = False     # a fence opened before the top-level value
+        self._last_partial = None
+
+    def feed(self, chunk: str) -> list:
+        events = []
+        self.buffer += chunk
+        while self.pos < len(self.buffer) and not self.done:
+            ch = self.buffer[self.pos]
+
+            if self.root is None:
+                if ch == "`" and not self.in_fence:
+                    ahead = self.buffer[self.pos:self.pos + len(self.FENCE)]
+                    if ahead == self.FENCE:
+                        # Skip the fence line (```json); its contents are the value
+                        newline = self.buffer.find("\n", self.pos)
+                        if newline == -1:
+                            break
+                        self.in_fence = True
+                        self.pos = newline + 1
+                        continue
+                    if self.FENCE.startswith(ahead) and self.pos + len(ahead) == len(self.buffer):
+                        break
+                if ch in self.OPENERS:
+                    starts = True if self.in_fence else self._starts_value(self.pos)
+                    if starts is None:
+                        break  # wait for the characters that decide it
+                    if starts:
+                        self.root = ch
+                        self.result = {} if ch == "{" else []
+                        self.stack.append(ch)
+                        self.member_start = self.pos + 1
+                self.pos += 1
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in self.OPENERS:
+                self.stack.append(ch)
+            elif ch in "}]":
+                if not self.stack or self.OPENERS[self.stack[-1]] != ch:
+                    raise ValueError(f"Malformed JSON: unexpected '{ch}' at offset {self.pos}")
+                if len(self.stack) == 1:
+                    events.extend(self._close_member(self.pos))
+                    self.done = True
+                self.stack.pop()
+            elif ch == "," and len(self.stack) == 1:
+                events.extend(self._close_member(self.pos))
+                self.member_start = self.pos + 1
+            self.pos += 1
+
+        if not self.done and self.root == "{" and self.in_string and len(self.stack) == 1:
+            events.extend(self._partial())
+        return events
+
+    def _starts_value(self, index: int):
+        """Whether the bracket at `index` is followed by JSON; None until enough text has arrived."""
+        rest = self.buffer[index + 1:].lstrip()
+        if not rest:
+            return None
+        if self.buffer[index] == "{":
+            return rest[0] in self.OBJECT_STARTS
+        if rest[0] in self.ARRAY_STARTS or rest[0] == "]":
+            return True
+        word = re.match(r"[A-Za-z]*", rest).group(0)
+        if len(word) == len(rest):
+            # The word may still be streaming
+            return None if any(w.startswith(word) for w in self.ARRAY_WORDS) else False
+        return word in self.ARRAY_WORDS
+
+    def close(self):
+        """Return the complete value; raises ValueError if the stream ended early."""
+        if not self.done:
+            raise ValueError("Malformed JSON: stream ended before the top-level value was closed")
+        return self.result
+
+    def _close_member(self, end: int) -> list:
+        text = self.buffer[self.member_start:end]
+        if not text.strip():
+            return []
+        try:
+            if self.root == "{":
+                member = _loads("{" + text + "}")
+                self.result.update(member)
+                return [("field", key, value) for key, value in member.items()]
+            value = _loads(text)
+            self.result.append(value)
+            return [("item", len(self.result) - 1, value)]
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Malformed JSON member {text.strip()[:200]!r}: {e}")
+
+    def _partial(self) -> list:
+        match = _PARTIAL_STRING_MEMBER.match(self.buffer[self.member_start:])
+        if not match:
+            return []
+        key = _decode_partial_string(match.group(1))
+        text = _decode_partial_string(match.group(2))
+        if (key, text) == self._last_partial:
+            return []
+        self._last_partial = (key, text)
+        return [("partial", key, text)]
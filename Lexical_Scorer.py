@@ -0,0 +1,123 @@
+import math
+import os
+import random
+import re
+import threading
+from collections import Counter
+
+
+# === Tiered Short-Answer Scoring ===
+# Cheap lexical stage in front of the embedding model:
+# - empty answers (no content words) score 0
+# - answers whose TF cosine with the reference is >= LEXICAL_BAND_HIGH score 1 (near-verbatim)
+# - very short answers whose TF cosine is <= LEXICAL_BAND_LOW score 0 (unrelated); longer ones
+#   may be paraphrases with no shared words, so they always go to embeddings
+# - answers that differ from the reference in negation ("is" vs "is not") always go to embeddings
+# - everything in between is ambiguous and is decided by embeddings (Actions.py)
+LEXICAL_BAND_LOW = float(os.getenv("SHORT_ANSWER_LEXICAL_LOW", "0.1"))
+LEXICAL_BAND_HIGH = float(os.getenv("SHORT_ANSWER_LEXICAL_HIGH", "0.8"))
+# Content words up to which a low-similarity answer is rejected without embeddings
+REJECT_MAX_WORDS = int(os.getenv("SHORT_ANSWER_LEXICAL_REJECT_MAX_WORDS", "3"))
+# Fraction of lexically decided answers also graded with embeddings, to measure agreement;
+# audited answers get the embedding verdict, so grading never depends on this setting
+AUDIT_RATE = float(os.getenv("SHORT_ANSWER_AUDIT_RATE", "0"))
+
+TIERS = ("empty", "lexical_accept", "lexical_reject", "embedding")
+
+STOPWORDS = frozenset("""
+a an the and or but if of to in on at by for with from as is are was were be been being it its
+this that these those there here which who whom what when where why how do does did so
+than then too very can could should would will shall may might must i you he she we they me him
+her us them my your his our their
+""".split())
+
+# Kept as content words: they flip the meaning of an otherwise identical answer
+NEGATIONS = frozenset("not no never none nor neither cannot without".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CONTRACTED_NOT = re.compile(r"n['’]t\b")
+
+
+def normalize_tokens(text: str) -> list:
+    """Lowercased content words with a light plural/suffix strip."""
+    tokens = []
+    for word in _WORD.findall(_CONTRACTED_NOT.sub(" not", str(text or "").lower())):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def lexical_similarity(user_answer: str, correct_answer: str) -> float:
+    """Cosine similarity of the term-frequency vectors of the two answers (0.0 to 1.0)."""
+    user_tf = Counter(normalize_tokens(user_answer))
+    correct_tf = Counter(normalize_tokens(correct_answer))
+    if not user_tf or not correct_tf:
+        return 0.0
+    dot = sum(count * correct_tf[token] for token, count in user_tf.items())
+    norm = math.sqrt(sum(c * c for c in user_tf.values())) * math.sqrt(sum(c * c for c in correct_tf.values()))
+    return dot / norm
+
+
+def _negations(tokens: list) -> int:
+    return sum(token in NEGATIONS for token in tokens)
+
+
+def prescore(user_answer: str, correct_answer: str):
+    """(tier, score) for a clear case, or ("embedding", None) when the embedding model must decide."""
+    user_tokens = normalize_tokens(user_answer)
+    if not user_tokens:
+        return "empty", 0
+    if _negations(user_tokens) != _negations(normalize_tokens(correct_answer)):
+        return "embedding", None
+    similarity = lexical_similarity(user_answer, correct_answer)
+    if similarity >= LEXICAL_BAND_HIGH:
+        return "lexical_accept", 1
+    if similarity <= LEXICAL_BAND_LOW and len(user_tokens) <= REJECT_MAX_WORDS:
+        return "lexical_reject", 0
+    return "embedding", None
+
+
+class ScorerStats:
+    """Thread-safe per-tier counters and lexical/embedding agreement on audited answers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = Counter()
+        self.audited = 0
+        self.agreed = 0
+
+    def record(self, tier: str):
+        with self._lock:
+            self.counts[tier] += 1
+
+    def record_audit(self, agreed: bool):
+        with self._lock:
+            self.audited += 1
+            self.agreed += int(agreed)
+
+    def should_audit(self, tier: str) -> bool:
+        return tier in ("lexical_accept", "lexical_reject") and AUDIT_RATE > 0 and random.random() < AUDIT_RATE
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = sum(self.counts.values())
+            return {
+                "total": total,
+                "counts": {tier: self.counts[tier] for tier in TIERS},
+                "hit_rates": {tier: (self.counts[tier] / total if total else 0.0) for tier in TIERS},
+                "audited": self.audited,
+                "agreement": self.agreed / self.audited if self.audited else None,
+            }
+
+
+stats = ScorerStats()
+
+
+def scorer_stats() -> dict:
+    """Per-tier hit rates since startup, plus lexical/embedding agreement when auditing is on."""
+    return stats.snapshot()
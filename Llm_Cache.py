@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+# === LLM Response Cache ===
+# LLM_CACHE_MODE:
+# - passthrough (default): every call goes to the provider, nothing is stored
+# - record: identical requests are served from the cache, misses are called live and stored
+# - replay: only cached responses are served; a miss raises LlmCacheMiss (offline runs, CI, benchmarks)
+MODE = os.getenv("LLM_CACHE_MODE", "passthrough").strip().lower()
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite3"))
+MODES = ("passthrough", "record", "replay")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    content BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class LlmCacheMiss(LookupError):
+    """Replay mode found no recorded response for a request."""
+
+
+def request_key(model: str, messages: list, params: dict) -> str:
+    """Content address of a request: model, messages and generation parameters."""
+    payload = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LlmCache:
+    """SQLite store of zlib-compressed completion texts keyed by request_key()."""
+
+    def __init__(self, path: str = CACHE_PATH, mode: str = MODE):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM_CACHE_MODE '{mode}'. Choose one of: {', '.join(MODES)}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        if mode != "passthrough":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connect().executescript(SCHEMA)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "passthrough"
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        """Cached content for `key`, or None. In replay mode a miss raises LlmCacheMiss."""
+        if not self.enabled:
+            return None
+        row = self._connect().execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+        if row:
+            self.hits += 1
+            return zlib.decompress(row[0]).decode("utf-8")
+        self.misses += 1
+        if self.mode == "replay":
+            raise LlmCacheMiss(f"No recorded LLM response for request {key[:12]} (LLM_CACHE_MODE=replay)")
+        return None
+
+    def put(self, key: str, model: str, content: str):
+        if self.mode != "record":
+            return
+        self._connect().execute(
+            "INSERT OR REPLACE INTO responses (key, model, content, created_at) VALUES (?, ?, ?, ?)",
+            (key, model, zlib.compress(content.encode("utf-8"), 9), time.time()),
+        )
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LlmCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LlmCache()
+    return _cache
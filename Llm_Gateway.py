@@ -0,0 +1,255 @@
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from dotenv import load_dotenv
+import streamlit as st
+
+load_dotenv()
+from Llm_Cache import get_llm_cache, request_key
+
+
+def _setting(name: str, default: str) -> str:
+    """Environment variable, else a Streamlit secret of the same name (hosted deployments), else the default."""
+    value = os.getenv(name)
+    if value is None:
+        try:
+            value = st.secrets.get(name)
+        except Exception:
+            value = None
+    return default if value is None else str(value)
+
+
+# === Gateway Settings ===
+# Every LLM call in the app goes through this module: one client (and one
+# keep-alive connection pool) per process, shared by all sessions.
+PROVIDER = "fireworks-ai"
+MODEL = "meta-llama/Llama-3.1-8B-Instruct"
+TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# The limits below are shared by every session of the process, so they are sized per deployment
+# (a classroom needs more than a single user) from the provider account's quota.
+MAX_CONCURRENCY = int(_setting("LLM_MAX_CONCURRENCY", "8"))
+# Requests per second of the token bucket; 0 (default) leaves pacing to the concurrency cap
+# and the 429 / Retry-After handling below
+RATE_PER_SECOND = float(_setting("LLM_RATE_PER_SECOND", "0"))
+BURST = int(_setting("LLM_BURST", "4"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket; callers reserve a token and wait until it is due."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return how many seconds to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+rate_limiter = TokenBucket(RATE_PER_SECOND, BURST)
+_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def _api_key():
+    return os.getenv("hf_token") or st.secrets["hf_token"]
+
+
+def get_client():
+    """Process-wide InferenceClient; huggingface_hub is imported on the first LLM call."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from huggingface_hub import InferenceClient
+                _client = InferenceClient(provider=PROVIDER, api_key=_api_key(), timeout=TIMEOUT)
+    return _client
+
+
+def get_async_client():
+    """Process-wide AsyncInferenceClient for achat(); created on the first async call."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                from huggingface_hub import AsyncInferenceClient
+                _async_client = AsyncInferenceClient(provider=PROVIDER, api_key=_api_key(), timeout=TIMEOUT)
+    return _async_client
+
+
+# === Retry Policy ===
+def _status_code(error: Exception):
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRY_STATUSES
+    # No HTTP response: timeouts and dropped connections are worth another try
+    name = type(error).__name__
+    return isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connect" in name
+
+
+def _backoff(error: Exception, attempt: int) -> float:
+    """Retry-After when the server sends one, else full-jitter exponential backoff."""
+    response = getattr(error, "response", None)
+    retry_after = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_CAP)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def _content(completion) -> str:
+    return completion.choices[0].message.content or ""
+
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap prompt-size estimate: words and punctuation marks, about one token each."""
+    return len(_TOKEN_PATTERN.findall(text or ""))
+
+
+def estimate_message_tokens(messages: list) -> int:
+    """estimate_tokens() over a chat message list, plus a few tokens of framing per message."""
+    return sum(estimate_tokens(m.get("content", "")) + 4 for m in messages)
+
+
+# === Public API ===
+# Every entry point consults the record/replay cache (Llm_Cache.py) before going to the provider.
+def chat(messages: list, model: str = MODEL, **params) -> str:
+    """Chat completion through the shared client; returns the message content."""
+    cache = get_llm_cache()
+    key = request_key(model, messages, params)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    content = _chat_live(messages, model, **params)
+    cache.put(key, model, content)
+    return content
+
+
+def _chat_live(messages: list, model: str, **params) -> str:
+    for attempt in range(MAX_RETRIES + 1):
+        rate_limiter.acquire()
+        try:
+            with _slots:
+                return _content(get_client().chat.completions.create(model=model, messages=messages, **params))
+        except Exception as e:
+            if attempt == MAX_RETRIES or not _is_retryable(e):
+                raise
+            delay = _backoff(e, attempt)
+            print(f"LLM call failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+async def achat(messages: list, model: str = MODEL, **params) -> str:
+    """Async chat completion sharing the gateway's retry policy, rate limit and concurrency cap."""
+    cache = get_llm_cache()
+    key = request_key(model, messages, params)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    content = await _achat_live(messages, model, **params)
+    cache.put(key, model, content)
+    return content
+
+
+async def _achat_live(messages: list, model: str, **params) -> str:
+    for attempt in range(MAX_RETRIES + 1):
+        await rate_limiter.aacquire()
+        # The semaphore is shared with the sync entry points, so wait for a slot off the event loop
+        await asyncio.to_thread(_slots.acquire)
+        try:
+            completion = await get_async_client().chat.completions.create(model=model, messages=messages, **params)
+            return _content(completion)
+        except Exception as e:
+            if attempt == MAX_RETRIES or not _is_retryable(e):
+                raise
+            delay = _backoff(e, attempt)
+            print(f"LLM call failed ({e}); retrying in {delay:.1f}s")
+        finally:
+            _slots.release()
+        await asyncio.sleep(delay)
+
+
+def stream_chat(messages: list, model: str = MODEL, **params):
+    """
+    Streaming chat completion: yields content deltas as they arrive.
+    Retries only happen before the first delta; closing the generator early ends the request.
+    Cached responses are replayed as a single delta; only fully consumed streams are recorded.
+    """
+    cache = get_llm_cache()
+    key = request_key(model, messages, params)
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    deltas = []
+    for delta in _stream_live(messages, model, **params):
+        deltas.append(delta)
+        yield delta
+    cache.put(key, model, "".join(deltas))
+
+
+def _stream_live(messages: list, model: str, **params):
+    for attempt in range(MAX_RETRIES + 1):
+        rate_limiter.acquire()
+        _slots.acquire()
+        started = False
+        try:
+            stream = get_client().chat.completions.create(model=model, messages=messages, stream=True, **params)
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    started = True
+                    yield delta
+            return
+        except Exception as e:
+            if started or attempt == MAX_RETRIES or not _is_retryable(e):
+                raise
+            delay = _backoff(e, attempt)
+            print(f"LLM stream failed ({e}); retrying in {delay:.1f}s")
+        finally:
+            _slots.release()
+        time.sleep(delay)
+
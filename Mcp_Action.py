@@ -1,51 +1,169 @@
 import os
-import json
-import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
-from huggingface_hub import InferenceClient
+from Llm_Gateway import stream_chat
+from Json_Stream import IncrementalJSONParser
+from Scrape_Cache import get_scrape_cache, origin_validators, revalidate
+from Content_Prep import prepare_sources
+from Json_Repair import salvage_array
 import streamlit as st
  
 load_dotenv()
- 
-FIRECRAWL_API_KEY = os.getenv("firecrawl_api_key") or st.secrets["firecrawl_api_key"]
-HF_TOKEN = os.getenv("hf_token") or st.secrets["hf_token"]
- 
-client = InferenceClient(provider="fireworks-ai", api_key=HF_TOKEN)
+
+QUIZ_TYPES = ("MCQ", "ShortAnswer", "Coding")
+# Follow-up calls asking only for the questions still missing after salvaging a broken response
+REPAIR_ATTEMPTS = int(os.getenv("LLM_REPAIR_ATTEMPTS", "1"))
+
+# === Scraping Settings ===
+FIRECRAWL_URL = "https://api.firecrawl.dev/v1/scrape"
+# URLs fetched at once across all sessions (also the keep-alive pool size)
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "4"))
+SCRAPE_CONNECT_TIMEOUT = float(os.getenv("SCRAPE_CONNECT_TIMEOUT", "5"))
+SCRAPE_READ_TIMEOUT = float(os.getenv("SCRAPE_READ_TIMEOUT", "30"))
+# Overall limit for one scrape_sources() call; unfinished URLs are marked as timed out
+SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE", "60"))
+
+scrape_executor = ThreadPoolExecutor(max_workers=SCRAPE_WORKERS, thread_name_prefix="scrape")
+# Origin validators are looked up after a page is cached, off the scrape path
+validator_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="scrape-validators")
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _firecrawl_key():
+    return os.getenv("firecrawl_api_key") or st.secrets["firecrawl_api_key"]
+
+
+def get_session() -> requests.Session:
+    """Process-wide keep-alive session for Firecrawl requests."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SCRAPE_WORKERS)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
  
 def scrape_with_firecrawl(url: str) -> str:
     """Scrape visible text content from a single webpage using Firecrawl."""
-    response = requests.post(
-        "https://api.firecrawl.dev/v1/scrape",
+    response = get_session().post(
+        FIRECRAWL_URL,
         headers={
-            "Authorization": f"Bearer {FIRECRAWL_API_KEY}",
+            "Authorization": f"Bearer {_firecrawl_key()}",
             "Content-Type": "application/json"
         },
-        json={"url": url}
+        json={"url": url},
+        timeout=(SCRAPE_CONNECT_TIMEOUT, SCRAPE_READ_TIMEOUT)
     )
     if response.status_code != 200:
         raise Exception(f"Failed to scrape {url}: {response.text}")
    
     data = response.json()
     return data.get("content", {}).get("text", "")
+
+
+def _fetch(url: str, force_refresh: bool):
+    """(content, source): the scrape cache first (fresh, or confirmed by the origin), else Firecrawl."""
+    cache = get_scrape_cache()
+    entry = None if force_refresh else cache.get(url)
+    if entry:
+        if entry["fresh"]:
+            return entry["content"], "cache"
+        if revalidate(entry, get_session()):
+            cache.touch(url)
+            return entry["content"], "revalidated"
+
+    content = scrape_with_firecrawl(url)
+    # An empty scrape is more likely a transient failure than an empty page: do not cache it
+    if content.strip() and cache.enabled:
+        cache.put(url, content)
+        validator_executor.submit(_store_validators, url)
+    return content, "network"
+
+
+def _store_validators(url: str):
+    validators = origin_validators(url, get_session())
+    get_scrape_cache().set_validators(url, validators.get("etag"), validators.get("last_modified"))
+
+
+def _scrape_one(url: str, force_refresh: bool = False) -> dict:
+    started = time.monotonic()
+    try:
+        content, source = _fetch(url, force_refresh)
+        return {"url": url, "ok": True, "content": content, "error": None, "source": source,
+                "elapsed": time.monotonic() - started}
+    except requests.Timeout:
+        error = f"timed out after {time.monotonic() - started:.1f}s"
+    except Exception as e:
+        error = str(e)
+    return {"url": url, "ok": False, "content": "", "error": error, "source": None,
+            "elapsed": time.monotonic() - started}
+
+
+def scrape_sources(urls: list, deadline: float = None, force_refresh: bool = False) -> list:
+    """
+    Scrape every URL concurrently on the shared pool, serving repeats from the scrape cache
+    unless `force_refresh` is set.
+    Returns one {"url", "ok", "content", "error", "source", "elapsed"} per URL in input order,
+    with source "cache", "revalidated" or "network"; failures and URLs still unfinished at
+    the deadline are marked, not raised.
+    """
+    deadline = SCRAPE_DEADLINE if deadline is None else deadline
+    futures = [scrape_executor.submit(_scrape_one, url, force_refresh) for url in urls]
+    wait(futures, timeout=deadline)
+
+    results = []
+    for url, future in zip(urls, futures):
+        if future.done():
+            results.append(future.result())
+        else:
+            # Still queued or running: drop it, the request ends at its own read timeout
+            future.cancel()
+            results.append({"url": url, "ok": False, "content": "", "source": None,
+                            "error": f"not finished within the {deadline:g}s deadline", "elapsed": deadline})
+    return results
+
  
-def scrape_multiple(urls: list) -> str:
+def scrape_multiple(urls: list, force_refresh: bool = False) -> str:
     texts = []
-    for url in urls:
-        try:
-            content = scrape_with_firecrawl(url)
-            texts.append(f"Content from {url}:\n{content}")
-        except Exception as e:
-            texts.append(f"[ERROR scraping {url}]: {e}")
+    for source in scrape_sources(urls, force_refresh=force_refresh):
+        if source["ok"]:
+            texts.append(f"Content from {source['url']}:\n{source['content']}")
+        else:
+            texts.append(f"[ERROR scraping {source['url']}]: {source['error']}")
     return "\n\n".join(texts)
+
+
+def scrape_prepared(urls: list, force_refresh: bool = False, stats: dict = None) -> str:
+    """
+    Like scrape_multiple, but the text is cleaned for prompting (Content_Prep.py): boilerplate
+    and near-duplicate paragraphs are removed and the total is trimmed to CONTENT_TOKEN_BUDGET.
+    Failed URLs are left out of the text and listed in stats["failed"] as (url, error).
+    """
+    results = scrape_sources(urls, force_refresh=force_refresh)
+    prep_stats = {}
+    prepared = prepare_sources([(r["url"], r["content"]) for r in results if r["ok"]], stats=prep_stats)
+    if stats is not None:
+        stats.update(prep_stats)
+        stats["failed"] = [(r["url"], r["error"]) for r in results if not r["ok"]]
+    return "\n\n".join(f"Content from {url}:\n{text}" for url, text in prepared if text)
  
-def call_llm_generate(content: str, num_questions=5):
-    """Generate a list of quiz questions from scraped content."""
+def _quiz_prompt(content: str, num_questions: int, focus: str = None) -> str:
+    focus_line = f"\nEvery question must be about the subtopic: {focus}\n" if focus else ""
     prompt = f"""
 You are a helpful quiz generator assistant.
  
 From the text content below, generate {num_questions} quiz questions.
-Use different types: MCQ, ShortAnswer, and Coding.
+{focus_line}Use different types: MCQ, ShortAnswer, and Coding.
  
 Return a JSON array like this:
  
@@ -81,19 +199,85 @@ Only return valid JSON. No explanation.
 Content:
 \"\"\"{content}\"\"\"
 """
+    return prompt
  
-    response = client.chat.completions.create(
-        model="meta-llama/Llama-3.1-8B-Instruct",
-        messages=[{"role": "system", "content": prompt.strip()}]
-    )
- 
-    raw = response.choices[0].message.content.strip()
-    cleaned = re.sub(r"^```json\s*|\s*```$", "", raw)
- 
-    if not cleaned:
-        raise ValueError("LLM returned empty or null response.")
- 
+def valid_quiz_item(item) -> bool:
+    """A quiz question has a known type, a question text and a correct answer (MCQ: 2+ options)."""
+    if not isinstance(item, dict) or item.get("type") not in QUIZ_TYPES:
+        return False
+    if not str(item.get("question") or "").strip() or item.get("correct_answer") in (None, "", []):
+        return False
+    return item["type"] != "MCQ" or (isinstance(item.get("options"), list) and len(item["options"]) >= 2)
+
+
+def _generate_items(prompt: str, on_item) -> tuple:
+    """
+    Stream one generation call, passing each valid question to on_item(question) as soon as
+    its array element is complete; returns (invalid or broken count, raw response).
+    A response that breaks part-way, or is not a plain array, is salvaged once complete.
+    """
+    parser = IncrementalJSONParser()
+    chunks, parsed, valid, streaming = [], 0, 0, True
+    stream = stream_chat([{"role": "system", "content": prompt.strip()}])
     try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Failed to parse LLM response:\n{raw}\n\nError: {e}")
\ No newline at end of file
+        for chunk in stream:
+            chunks.append(chunk)
+            if not streaming:
+                continue
+            try:
+                for event, _, value in parser.feed(chunk):
+                    if event == "item":
+                        parsed += 1
+                        if valid_quiz_item(value):
+                            valid += 1
+                            on_item(value)
+            except ValueError:
+                streaming = False
+            if parser.done:
+                break
+    finally:
+        stream.close()
+
+    raw = "".join(chunks).strip()
+    if streaming and parser.done and parser.root == "[":
+        return parsed - valid, raw
+    # Elements before the break were already passed on; salvage the ones after it
+    items, broken = salvage_array(raw) if raw else ([], 0)
+    rest = items[parsed:]
+    for item in rest:
+        if valid_quiz_item(item):
+            valid += 1
+            on_item(item)
+    return parsed + len(rest) + broken - valid, raw
+
+
+def call_llm_generate(content: str, num_questions=5, focus: str = None, on_item=None):
+    """
+    Generate a list of quiz questions from scraped content, optionally about one subtopic.
+    The response is streamed: on_item(question), if given, is called for each question as soon
+    as it is complete. Valid items are salvaged from a partly broken response (Json_Repair.py);
+    only the missing ones are requested again, up to LLM_REPAIR_ATTEMPTS times.
+    """
+    questions = []
+
+    def accept(item):
+        if len(questions) < num_questions:
+            questions.append(item)
+            if on_item is not None:
+                on_item(item)
+
+    invalid, raw = _generate_items(_quiz_prompt(content, num_questions, focus), accept)
+    for _ in range(REPAIR_ATTEMPTS):
+        missing = num_questions - len(questions)
+        if missing <= 0:
+            break
+        print(f"Salvaged {len(questions)}/{num_questions} questions ({invalid} invalid); requesting {missing} more")
+        existing = "\n".join(f"- {q['question']}" for q in questions)
+        prompt = _quiz_prompt(content, missing, focus)
+        if existing:
+            prompt += f"\nThese questions already exist, do not repeat them:\n{existing}\n"
+        invalid, _ = _generate_items(prompt, accept)
+
+    if not questions:
+        raise ValueError(f"Failed to parse LLM response:\n{raw}")
+    return questions
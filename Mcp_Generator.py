@@ -1,5 +1,6 @@
 import streamlit as st
 from Mcp_Action import *
+from Quiz_Pipeline import generate_quiz_stream
  
 st.set_page_config(page_title="🔥 Firecrawl Quiz Generator", layout="centered")
 st.title("🌐 Web-Based Intelligent Quiz Generator")
@@ -13,18 +14,30 @@ if st.session_state.step == "input":
     st.markdown("Enter one or more comma-separated URLs to generate a quiz from the content.")
     urls_input = st.text_area("🔗 URLs (comma-separated):")
     num_q = st.number_input("🧠 Number of questions", min_value=1, max_value=20, value=5)
+    force_refresh = st.checkbox("♻️ Force refresh (ignore cached pages)", value=False)
  
     if st.button("🚀 Generate Quiz"):
         urls = [u.strip() for u in urls_input.split(",") if u.strip()]
         if not urls:
             st.warning("Please enter at least one valid URL.")
         else:
+            prep_stats = {}
             with st.spinner("🔍 Scraping websites..."):
-                content = scrape_multiple(urls)
+                content = scrape_prepared(urls, force_refresh=force_refresh, stats=prep_stats)
             try:
                 with st.spinner("🤖 Generating quiz using LLM..."):
-                    quiz = call_llm_generate(content, num_questions=num_q)
+                    # Show each question as soon as it has been generated
+                    quiz = []
+                    progress = st.empty()
+                    quiz_stats = {}
+                    for q in generate_quiz_stream(content, num_questions=num_q, stats=quiz_stats):
+                        quiz.append(q)
+                        progress.markdown("\n\n".join(
+                            f"**Q{i}: ({item.get('type')})** {item.get('question')}" for i, item in enumerate(quiz, start=1)
+                        ))
                     st.session_state.quiz = quiz
+                    st.session_state.quiz_stats = quiz_stats
+                    st.session_state.prep_stats = prep_stats
                     st.session_state.step = "quiz"
                     st.rerun()
             except Exception as e:
@@ -34,6 +47,16 @@ if st.session_state.step == "input":
 elif st.session_state.step == "quiz":
     st.subheader("📋 Quiz Questions")
     quiz = st.session_state.quiz
+    prep_stats = st.session_state.get("prep_stats")
+    if prep_stats:
+        for url, error in prep_stats.get("failed", []):
+            st.warning(f"Could not scrape {url}: {error}")
+        st.caption(f"Content cleanup: {prep_stats['raw_tokens']} → {prep_stats['final_tokens']} tokens "
+                   f"({prep_stats['tokens_saved']} saved, {prep_stats['saved_ratio']:.0%})")
+    quiz_stats = st.session_state.get("quiz_stats")
+    if quiz_stats:
+        st.caption(f"Sent ~{quiz_stats['prompt_tokens']} of {quiz_stats['content_tokens']} content tokens "
+                   f"to the LLM ({quiz_stats['mode']}, {quiz_stats['calls']} calls)")
  
     for idx, q in enumerate(quiz, start=1):
         st.markdown(f"### Q{idx}: ({q['type']})\n**{q['question']}**")
@@ -0,0 +1,77 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+
+# === Background Workers ===
+# Shared by all sessions; prefetch jobs are plain functions and never touch st.session_state.
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+# Largest per-tag belief difference for which a speculated question is still used
+PREFETCH_TOLERANCE = float(os.getenv("PREFETCH_TOLERANCE", "0.1"))
+# Longest wait (seconds) for a branch that is still generating before generating inline instead
+PREFETCH_WAIT = float(os.getenv("PREFETCH_WAIT", "15"))
+
+executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+
+class QuestionPrefetcher:
+    """
+    Speculatively prepares the next question while the current one is displayed.
+
+    One branch is started per likely outcome of the current question (e.g. pass
+    and fail), each from the beliefs that outcome would produce. When the real
+    score is known, the nearest branch is used if its decision equals the real
+    one (when the caller can compute it cheaply) or else if its beliefs still
+    match the real ones; otherwise everything is discarded and the caller
+    generates as usual.
+    """
+
+    def __init__(self):
+        self.branches = {}   # outcome -> (predicted beliefs, Future)
+
+    def speculate(self, branches: dict, produce):
+        """
+        branches: {outcome score: predicted beliefs}
+        produce: fn(predicted beliefs) -> (decision, question), run in the background
+        """
+        self.cancel()
+        for outcome, beliefs in branches.items():
+            self.branches[outcome] = (beliefs, executor.submit(produce, beliefs))
+
+    def take(self, score: float, beliefs: dict, decision: dict = None, timeout: float = None):
+        """
+        Return (decision, question) for the branch nearest to `score`, or None if
+        there is none, it failed, or its beliefs/decision no longer match.
+        Waits up to `timeout` seconds for a branch that is still running, since it started
+        well before a fresh call would; a branch still queued behind other sessions' jobs
+        is cancelled instead, as generating inline is then no slower.
+        """
+        if not self.branches:
+            return None
+        outcome = min(self.branches, key=lambda o: abs(o - score))
+        predicted, future = self.branches.pop(outcome)
+        self.cancel()
+
+        drift = max((abs(predicted.get(tag, 0) - value) for tag, value in beliefs.items()), default=0)
+        if decision is None and drift > PREFETCH_TOLERANCE:
+            future.cancel()
+            return None
+
+        if future.cancel():
+            return None
+        try:
+            result = future.result(timeout=timeout)
+        except TimeoutError:
+            print(f"Prefetch still running after {timeout}s; generating inline")
+            return None
+        except Exception as e:
+            print(f"Prefetch failed: {e}")
+            return None
+        if not result or (decision is not None and result[0] != decision):
+            return None
+        return result
+
+    def cancel(self):
+        """Drop every pending branch (jobs already running finish and are ignored)."""
+        for _, future in self.branches.values():
+            future.cancel()
+        self.branches = {}
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+
+# === Question Bank Settings ===
+BANK_PATH = os.getenv("QUESTION_BANK_PATH", os.path.join(".cache", "question_bank.sqlite3"))
+# Serve from the bank only when at least this many unseen questions exist for the student;
+# below that a fresh question is generated so popular combinations keep growing.
+MIN_UNSEEN = int(os.getenv("QUESTION_BANK_MIN_UNSEEN", "3"))
+ENABLED = os.getenv("QUESTION_BANK", "1") != "0"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    topic TEXT NOT NULL DEFAULT '',
+    tags_key TEXT NOT NULL,
+    type TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    question_json TEXT NOT NULL,
+    content_hash TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen (
+    student_id TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    PRIMARY KEY (student_id, question_id)
+);
+"""
+
+
+# Created after the topic column migration, which older banks need first
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_questions_topic_params ON questions (topic, tags_key, type, difficulty);
+"""
+
+
+def tags_key(tags: list) -> str:
+    """Order- and case-insensitive key for a tag combination."""
+    return "|".join(sorted({str(tag).strip().lower() for tag in tags}))
+
+
+def topic_key(topic: str) -> str:
+    """Case-insensitive key for a topic; generic tags like "Basics" are only shared within one topic."""
+    return " ".join(str(topic or "").lower().split())
+
+
+class QuestionBank:
+    """
+    SQLite store of validated questions keyed by (topic, tags, type, difficulty).
+    Questions returned by the bank carry their row id as "bank_id".
+    """
+
+    def __init__(self, path: str = BANK_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(questions)")}
+        if "topic" not in columns:
+            # Banks created before questions were keyed by topic: existing rows get the empty topic
+            conn.execute("ALTER TABLE questions ADD COLUMN topic TEXT NOT NULL DEFAULT ''")
+        conn.executescript(INDEXES)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread: prefetch workers and script threads use the bank concurrently
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def pick(self, tags: list, type: str, difficulty: str, student_id: str, min_unseen: int = MIN_UNSEEN,
+             topic: str = None):
+        """Return a random question the student has not seen, or None if fewer than `min_unseen` exist."""
+        rows = self._connect().execute(
+            """
+            SELECT id, question_json FROM questions
+            WHERE topic = ? AND tags_key = ? AND type = ? AND difficulty = ?
+              AND id NOT IN (SELECT question_id FROM seen WHERE student_id = ?)
+            """,
+            (topic_key(topic), tags_key(tags), type, difficulty, student_id),
+        ).fetchall()
+        if not rows or len(rows) < min_unseen:
+            return None
+        question_id, question_json = random.choice(rows)
+        return {**json.loads(question_json), "bank_id": question_id}
+
+    def add(self, tags: list, type: str, difficulty: str, question: dict, topic: str = None) -> int:
+        """Store a question (duplicates within a topic are ignored) and return its id."""
+        question = {k: v for k, v in question.items() if k != "bank_id"}
+        question_json = json.dumps(question, sort_keys=True)
+        topic = topic_key(topic)
+        # Questions without a topic keep the hash they had before topics were part of the key
+        hashed = f"{topic}\n{question_json}" if topic else question_json
+        content_hash = hashlib.sha256(hashed.encode("utf-8")).hexdigest()
+        conn = self._connect()
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO questions (topic, tags_key, type, difficulty, question_json, content_hash, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (topic, tags_key(tags), type, difficulty, question_json, content_hash, time.time()),
+        )
+        return conn.execute("SELECT id FROM questions WHERE content_hash = ?", (content_hash,)).fetchone()[0]
+
+    def mark_seen(self, student_id: str, question_id: int):
+        self._connect().execute(
+            "INSERT OR IGNORE INTO seen (student_id, question_id) VALUES (?, ?)", (student_id, question_id)
+        )
+
+    def count(self, tags: list = None, type: str = None, difficulty: str = None, topic: str = None) -> int:
+        query, params = "SELECT COUNT(*) FROM questions WHERE 1 = 1", []
+        for column, value in (("topic", topic_key(topic) if topic is not None else None),
+                              ("tags_key", tags_key(tags) if tags else None), ("type", type), ("difficulty", difficulty)):
+            if value is not None:
+                query += f" AND {column} = ?"
+                params.append(value)
+        return self._connect().execute(query, params).fetchone()[0]
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_question_bank():
+    """Return the process-wide question bank, or None when QUESTION_BANK=0."""
+    global _bank
+    if not ENABLED:
+        return None
+    if _bank is None:
+        with _bank_lock:
+            if _bank is None:
+                _bank = QuestionBank()
+    return _bank
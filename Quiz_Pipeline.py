@@ -0,0 +1,222 @@
+import math
+import os
+import queue
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from Json_Repair import loads_tolerant
+from Lexical_Scorer import normalize_tokens
+from Llm_Gateway import chat, estimate_tokens
+from Mcp_Action import call_llm_generate
+from Retrieval import VectorIndex
+from Scheduler import type_quotas
+
+
+# === Map-Reduce Quiz Generation ===
+# Scraped content is split into token-bounded chunks; each chunk gets its own
+# (concurrent) generation call, so latency follows the largest chunk rather
+# than the total content size. Each call streams its questions into the reduce
+# step as they complete, which drops duplicate questions, balances question
+# types and trims to the requested count.
+CHUNK_TOKENS = int(os.getenv("QUIZ_CHUNK_TOKENS", "1500"))
+QUIZ_WORKERS = int(os.getenv("QUIZ_WORKERS", "4"))
+# Questions requested in total relative to num_questions when there are several chunks
+OVERGENERATE = float(os.getenv("QUIZ_OVERGENERATE", "1.5"))
+# Token-set Jaccard similarity above which two questions count as duplicates
+DUPLICATE_SIMILARITY = 0.8
+
+# Large content is not sent whole: it is split into small chunks, embedded into
+# an in-memory index (Retrieval.py), and each subtopic's generation call only
+# gets the top-k chunks relevant to it.
+RETRIEVAL_ENABLED = os.getenv("QUIZ_RETRIEVAL", "1").strip().lower() not in ("0", "false", "no", "off")
+RETRIEVAL_MIN_TOKENS = int(os.getenv("QUIZ_RETRIEVAL_MIN_TOKENS", "3000"))
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "400"))
+OUTLINE_CHARS = 120
+# Chunks sampled (evenly) into the subtopic outline of very large content
+OUTLINE_MAX_CHUNKS = 60
+
+executor = ThreadPoolExecutor(max_workers=QUIZ_WORKERS, thread_name_prefix="quiz")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_oversized(paragraph: str, max_tokens: int) -> list:
+    """Split a paragraph that alone exceeds max_tokens at sentence, then word, boundaries."""
+    pieces, current = [], []
+    for sentence in _SENTENCE_END.split(paragraph):
+        words = [sentence] if estimate_tokens(sentence) <= max_tokens else sentence.split()
+        for part in words:
+            if current and estimate_tokens(" ".join(current + [part])) > max_tokens:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(part)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_text(content: str, max_tokens: int = CHUNK_TOKENS) -> list:
+    """Pack paragraphs greedily into chunks of at most max_tokens (estimated)."""
+    chunks, current, current_tokens = [], [], 0
+    for paragraph in re.split(r"\n\s*\n", content):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = estimate_tokens(paragraph)
+        pieces = [paragraph] if tokens <= max_tokens else _split_oversized(paragraph, max_tokens)
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def questions_per_chunk(chunks: list, num_questions: int) -> list:
+    """Split the request over chunks in proportion to their size (at least one each)."""
+    if len(chunks) == 1:
+        return [num_questions]
+    sizes = [estimate_tokens(chunk) for chunk in chunks]
+    total = sum(sizes) or 1
+    wanted = num_questions * OVERGENERATE
+    return [max(1, math.ceil(wanted * size / total)) for size in sizes]
+
+
+def _subtopic_prompt(outline: str, count: int) -> str:
+    return f"""
+You are a helpful assistant that plans a quiz.
+Below is an outline of some learning material: the opening words of each section.
+List the {count} most important distinct subtopics a quiz on this material should cover.
+
+Respond ONLY with valid JSON like: {{"subtopics": ["...", "..."]}}
+
+Outline:
+\"\"\"{outline}\"\"\"
+"""
+
+
+def extract_subtopics(chunks: list, count: int) -> list:
+    """Up to `count` subtopics of the content, from one small call over an outline of the chunks."""
+    step = max(1, math.ceil(len(chunks) / OUTLINE_MAX_CHUNKS))
+    outline = "\n".join(f"- {chunk[:OUTLINE_CHARS].strip()}" for chunk in chunks[::step])
+    raw = chat([{"role": "system", "content": _subtopic_prompt(outline, count).strip()}]).strip()
+    parsed = loads_tolerant(raw)
+    subtopics = parsed.get("subtopics", []) if isinstance(parsed, dict) else parsed
+    unique = list(dict.fromkeys(str(s).strip() for s in subtopics if str(s).strip()))
+    if not unique:
+        raise ValueError("LLM returned no subtopics.")
+    return unique[:count]
+
+
+def plan_generation(content: str, num_questions: int) -> tuple:
+    """
+    The map step's jobs as [(prompt content, question count, subtopic or None)] and the mode used:
+    "retrieval" for large content (per-subtopic top-k chunks), else "chunks" (every chunk).
+    """
+    if RETRIEVAL_ENABLED and estimate_tokens(content) >= RETRIEVAL_MIN_TOKENS:
+        try:
+            chunks = chunk_text(content, RETRIEVAL_CHUNK_TOKENS)
+            subtopics = extract_subtopics(chunks, max(1, math.ceil(num_questions / 2)))
+            contexts = VectorIndex(chunks).contexts(subtopics)
+            count = max(1, math.ceil(num_questions * OVERGENERATE / len(subtopics)))
+            return [(context, count, subtopic) for context, subtopic in zip(contexts, subtopics)], "retrieval"
+        except Exception as e:
+            print(f"Retrieval planning failed, generating from every chunk: {e}")
+
+    chunks = chunk_text(content)
+    counts = questions_per_chunk(chunks, num_questions)
+    return [(chunk, count, None) for chunk, count in zip(chunks, counts)], "chunks"
+
+
+class QuizReducer:
+    """Accepts questions as they arrive: drops duplicates and holds back types that are over quota."""
+
+    def __init__(self, num_questions: int):
+        self.num_questions = num_questions
+        self.quotas = type_quotas(num_questions)
+        self.accepted = []
+        self.overflow = []
+        self._seen = []
+
+    def _is_duplicate(self, question: dict) -> bool:
+        tokens = set(normalize_tokens(question.get("question", "")))
+        if not tokens:
+            return True
+        for seen in self._seen:
+            if len(tokens & seen) / len(tokens | seen) >= DUPLICATE_SIMILARITY:
+                return True
+        self._seen.append(tokens)
+        return False
+
+    def offer(self, question: dict) -> bool:
+        """True if the question is accepted now (and should be shown)."""
+        if len(self.accepted) >= self.num_questions or not isinstance(question, dict):
+            return False
+        if self._is_duplicate(question):
+            return False
+        q_type = question.get("type")
+        taken = sum(1 for q in self.accepted if q.get("type") == q_type)
+        if taken >= self.quotas.get(q_type, 0):
+            self.overflow.append(question)
+            return False
+        self.accepted.append(question)
+        return True
+
+    def fill(self) -> list:
+        """Once every chunk is done, top up unfilled quotas from held-back questions."""
+        added = self.overflow[:self.num_questions - len(self.accepted)]
+        self.accepted.extend(added)
+        return added
+
+
+def generate_quiz_stream(content: str, num_questions: int = 5, stats: dict = None):
+    """
+    Map-reduce quiz generation: yields accepted questions as soon as any generation call
+    completes one, so the first question shows before the slowest call (or even its own) ends.
+    Pass a dict as `stats` to receive the mode, content tokens and prompt content tokens sent.
+    Raises ValueError if no call produced any question.
+    """
+    jobs, mode = plan_generation(content, num_questions)
+    if not jobs:
+        raise ValueError("No content to generate questions from.")
+    if stats is not None:
+        stats.update({
+            "mode": mode,
+            "calls": len(jobs),
+            "content_tokens": estimate_tokens(content),
+            "prompt_tokens": sum(estimate_tokens(job_content) for job_content, _, _ in jobs),
+        })
+
+    # Map jobs put their questions, and finally their own Future, on one queue
+    arrivals = queue.Queue()
+    futures = {}
+    for i, (job_content, count, focus) in enumerate(jobs):
+        future = executor.submit(call_llm_generate, job_content, count, focus, arrivals.put)
+        futures[future] = i
+        future.add_done_callback(arrivals.put)
+
+    reducer = QuizReducer(num_questions)
+    errors = []
+    pending = len(futures)
+    while pending:
+        arrival = arrivals.get()
+        if isinstance(arrival, Future):
+            pending -= 1
+            if arrival.exception() is not None:
+                print(f"Quiz generation failed for job {futures[arrival]}: {arrival.exception()}")
+                errors.append(arrival.exception())
+            continue
+        if reducer.offer(arrival):
+            yield arrival
+    yield from reducer.fill()
+
+    if not reducer.accepted:
+        raise ValueError(f"No questions generated from {len(jobs)} call(s): {errors[0] if errors else 'empty output'}")
+
+
+def generate_quiz(content: str, num_questions: int = 5, stats: dict = None) -> list:
+    """Non-streaming generate_quiz_stream()."""
+    return list(generate_quiz_stream(content, num_questions, stats))
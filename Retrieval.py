@@ -0,0 +1,44 @@
+import os
+from Embeddings import encode
+
+
+# === Content Retrieval ===
+# In-memory vector index over content chunks, built with the same embedding
+# model used for short-answer grading. Rows are unit length, so a
+# matrix-vector product gives cosine similarities.
+TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+
+
+class VectorIndex:
+    """Embeds a fixed list of text chunks once and answers top-k similarity queries."""
+
+    def __init__(self, chunks: list):
+        self.chunks = list(chunks)
+        # Not through the embedding cache: it is never evicted on disk, and chunks would push out
+        # the reference-answer vectors it is meant to keep
+        self.vectors = encode(self.chunks, use_cache=False) if self.chunks else None
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def search_many(self, queries: list, k: int = TOP_K) -> list:
+        """For each query, [(chunk index, score)] of the k most similar chunks, best first."""
+        if not self.chunks or not queries:
+            return [[] for _ in queries]
+        scores = encode(list(queries)) @ self.vectors.T
+        k = min(k, len(self.chunks))
+        results = []
+        for row in scores:
+            best = row.argsort()[::-1][:k]
+            results.append([(int(i), float(row[i])) for i in best])
+        return results
+
+    def search(self, query: str, k: int = TOP_K) -> list:
+        return self.search_many([query], k)[0]
+
+    def contexts(self, queries: list, k: int = TOP_K) -> list:
+        """Per query, its top-k chunks in document order, joined as prompt content (one encode call)."""
+        return [
+            "\n\n".join(self.chunks[i] for i in sorted(i for i, _ in hits))
+            for hits in self.search_many(queries, k)
+        ]
@@ -0,0 +1,495 @@
+import json
+import math
+import os
+import secrets
+import shutil
+import signal
+import subprocess
+import time
+import sys
+import tempfile
+import threading
+import atexit
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from Sandbox_Harness import RESULT_MARKER, expected_hash
+from Sandbox_Pool import ContainerPool
+
+
+# === Sandbox Settings ===
+# SANDBOX_BACKEND selects where submissions run: "docker" (default) or "local"
+BACKEND = os.getenv("SANDBOX_BACKEND", "docker").strip().lower()
+IMAGE = "python:3.10-slim"
+HARNESS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Sandbox_Harness.py")
+CASE_TIMEOUT = float(os.getenv("SANDBOX_CASE_TIMEOUT", "5"))
+# Wall-clock budget for a whole submission; runaway sandboxes are killed shortly after it
+SUBMISSION_TIMEOUT = float(os.getenv("SANDBOX_SUBMISSION_TIMEOUT", "30"))
+KILL_GRACE = 3.0
+# Sandbox start-up (container start, exec, interpreter start) is not part of the submission's budget
+STARTUP_ALLOWANCE = float(os.getenv("SANDBOX_STARTUP_ALLOWANCE", "5"))
+
+# Warm container pool; SANDBOX_POOL_SIZE=0 starts a fresh container per submission instead
+POOL_SIZE = int(os.getenv("SANDBOX_POOL_SIZE", "0"))
+POOL_MAX_REUSE = int(os.getenv("SANDBOX_POOL_MAX_REUSE", "20"))
+POOL_IDLE_TTL = float(os.getenv("SANDBOX_POOL_IDLE_TTL", "300"))
+
+CONTAINER_LIMITS = {
+    "network_disabled": True,
+    "mem_limit": "128m",
+    "cpu_quota": 50000,
+}
+
+# Test cases of one submission are split across up to SANDBOX_PARALLELISM sandboxes,
+# and at most SANDBOX_MAX_CONCURRENT sandboxes run at once across all sessions
+PARALLELISM = int(os.getenv("SANDBOX_PARALLELISM", str(os.cpu_count() or 1)))
+MAX_CONCURRENT = int(os.getenv("SANDBOX_MAX_CONCURRENT", str(os.cpu_count() or 1)))
+
+# Local backend rlimits (the CPU time limit follows the submission's hard time limit)
+LOCAL_MEMORY_BYTES = int(os.getenv("SANDBOX_LOCAL_MEMORY_MB", "256")) * 1024 * 1024
+LOCAL_FILE_BYTES = int(os.getenv("SANDBOX_LOCAL_FILE_MB", "1")) * 1024 * 1024
+LOCAL_MAX_PROCESSES = int(os.getenv("SANDBOX_LOCAL_MAX_PROCESSES", "64"))
+# Without `unshare` the local backend's only network guard is a socket patch the solution can undo;
+# SANDBOX_LOCAL_REQUIRE_NETNS=1 refuses to run in that case instead of warning
+LOCAL_REQUIRE_NETNS = os.getenv("SANDBOX_LOCAL_REQUIRE_NETNS", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+class SandboxTimeout(Exception):
+    """The sandbox was killed for running past its hard time limit; `output` is what it printed until then."""
+
+    def __init__(self, output: str = ""):
+        super().__init__("Sandbox killed after its hard time limit")
+        self.output = output
+
+
+def build_payload(code: str, testcases: list, case_timeout: float = CASE_TIMEOUT,
+                  deadline: float = None, max_failures: int = None) -> dict:
+    """
+    Harness payload: the solution source plus each test input as call-argument source text.
+    Expected outputs only go in as salted digests (for fail-fast counting): the solution can read
+    the payload, and grading against the real values happens here in summarize().
+    """
+    salt = secrets.token_hex(16)
+    return {
+        "code": code.strip(),
+        "inputs": [str(test["input"]) for test in testcases],
+        "expected_hashes": [expected_hash(salt, str(test["expected_output"])) for test in testcases],
+        "salt": salt,
+        "case_timeout": case_timeout,
+        "deadline": deadline,
+        "max_failures": max_failures,
+    }
+
+
+def hard_limit(payload: dict) -> float:
+    """
+    Seconds after which a sandbox is killed; the harness' own deadlines normally fire first.
+    The harness clock starts once it is running, so start-up time gets its own allowance.
+    """
+    if payload.get("deadline") is not None:
+        return payload["deadline"] + KILL_GRACE + STARTUP_ALLOWANCE
+    return payload["case_timeout"] * (len(payload["inputs"]) + 1) + KILL_GRACE + STARTUP_ALLOWANCE
+
+
+def parse_harness_output(output: str, count: int) -> list:
+    """Per-case results printed by Sandbox_Harness, by case index; None for cases it never reported."""
+    results = [None] * count
+    for line in output.splitlines():
+        if line.startswith(RESULT_MARKER):
+            try:
+                case = json.loads(line[len(RESULT_MARKER):])
+            except json.JSONDecodeError:
+                continue
+            index = case.get("index") if isinstance(case, dict) else None
+            if isinstance(index, int) and 0 <= index < count:
+                results[index] = case
+    return results
+
+
+def summarize(testcases: list, case_results: list) -> dict:
+    """Fold per-case harness results into the passed/failed/total/details shape."""
+    passed = 0
+    failed = 0
+    skipped = 0
+    errors = []
+
+    for test, case in zip(testcases, case_results):
+        test_input = test["input"]
+        expected_output = str(test["expected_output"])
+
+        if case["status"] == "timeout":
+            failed += 1
+            errors.append({
+                "input": test_input,
+                "error": case["error"],
+                "timed_out": True,
+                "elapsed": case.get("elapsed", 0.0)
+            })
+        elif case["status"] == "skipped":
+            failed += 1
+            skipped += 1
+            errors.append({
+                "input": test_input,
+                "error": case["error"],
+                "skipped": True
+            })
+        elif case["status"] == "sandbox_error":
+            failed += 1
+            errors.append({
+                "input": test_input,
+                "error": case["error"],
+                "sandbox_error": True
+            })
+        elif case["status"] != "ok":
+            failed += 1
+            errors.append({
+                "input": test_input,
+                "error": case["error"]
+            })
+        elif case["output"] == expected_output:
+            passed += 1
+        else:
+            failed += 1
+            errors.append({
+                "input": test_input,
+                "expected": expected_output,
+                "got": case["output"]
+            })
+
+    summary = {
+        "passed": passed,
+        "failed": failed,
+        "total": len(testcases),
+        "details": errors
+    }
+    if skipped:
+        summary["skipped"] = skipped
+    return summary
+
+
+def _error_results(count: int, error: str, status: str = "error", elapsed: float = 0.0) -> list:
+    return [{"status": status, "error": error, "output": "", "elapsed": elapsed} for _ in range(count)]
+
+
+# === Concurrency Governor ===
+class SandboxGovernor:
+    """
+    Caps the number of sandboxes running in this process.
+    Waiting requests are granted round-robin across sessions, so one session's
+    large submission cannot starve another session's single test run.
+    """
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queues = {}       # session -> deque of waiting tickets
+        self._turns = deque()   # sessions with waiting tickets, in round-robin order
+
+    def _acquire(self, session):
+        ticket = object()
+        with self._cond:
+            if session not in self._queues:
+                self._queues[session] = deque()
+                self._turns.append(session)
+            self._queues[session].append(ticket)
+
+            while self._active >= self.max_concurrent or self._queues[self._turns[0]][0] is not ticket:
+                self._cond.wait()
+
+            # Granted: move this session to the back of the line
+            self._active += 1
+            self._turns.popleft()
+            self._queues[session].popleft()
+            if self._queues[session]:
+                self._turns.append(session)
+            else:
+                del self._queues[session]
+            self._cond.notify_all()
+
+    def _release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, session=None):
+        self._acquire(session)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"active": self._active, "waiting": sum(len(q) for q in self._queues.values())}
+
+
+governor = SandboxGovernor(MAX_CONCURRENT)
+
+
+# === Backends ===
+class SandboxBackend:
+    """Runs Sandbox_Harness on a payload in isolation and returns the harness output."""
+
+    name = "base"
+
+    def execute(self, payload: dict) -> str:
+        raise NotImplementedError
+
+
+class DockerBackend(SandboxBackend):
+    """One network-disabled, memory-limited container per submission, optionally from a warm pool."""
+
+    name = "docker"
+
+    def __init__(self):
+        import docker
+        self.docker = docker
+        # One client (and its connection pool) for the life of the process
+        self.client = docker.from_env()
+        self.pool = None
+        if POOL_SIZE > 0:
+            with open(HARNESS_PATH, "rb") as f:
+                harness_source = f.read()
+            self.pool = ContainerPool(
+                self.client,
+                IMAGE,
+                harness_source,
+                size=POOL_SIZE,
+                max_reuse=POOL_MAX_REUSE,
+                idle_ttl=POOL_IDLE_TTL,
+                run_kwargs={**CONTAINER_LIMITS, "pids_limit": 64},
+            )
+            atexit.register(self.pool.shutdown)
+
+    def execute(self, payload: dict) -> str:
+        # coreutils `timeout` exits with 124 when it had to stop the harness
+        limit = ["timeout", "-k", "1", f"{hard_limit(payload):.1f}"]
+
+        if self.pool:
+            data = json.dumps(payload).encode("utf-8")
+            exit_code, output = self.pool.run(data, limit + ["python", "/sandbox/harness.py", "/sandbox/payload.json"])
+            if exit_code == 124:
+                raise SandboxTimeout(output)
+            return output
+
+        work_dir = tempfile.mkdtemp()
+        try:
+            shutil.copy(HARNESS_PATH, os.path.join(work_dir, "harness.py"))
+            with open(os.path.join(work_dir, "payload.json"), "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+
+            # Detached, so the output of a killed run (the cases it finished) can still be read
+            container = self.client.containers.run(
+                image=IMAGE,
+                command=limit + ["python", "/code/harness.py", "/code/payload.json"],
+                volumes={work_dir: {"bind": "/code", "mode": "ro"}},
+                detach=True,
+                **CONTAINER_LIMITS,
+            )
+            try:
+                try:
+                    exit_code = container.wait(timeout=hard_limit(payload) + STARTUP_ALLOWANCE).get("StatusCode")
+                except Exception:
+                    # `timeout` inside the container did not stop it in time
+                    container.kill()
+                    exit_code = 124
+                output = container.logs(stdout=True, stderr=True).decode(errors="replace")
+            finally:
+                container.remove(force=True)
+            if exit_code == 124:
+                raise SandboxTimeout(output)
+            return output
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+class LocalBackend(SandboxBackend):
+    """
+    Runs the harness in a local subprocess (POSIX only) for dev machines, CI and Docker-less hosts.
+
+    - rlimits on CPU time, address space, file size and process count, applied by the harness
+    - private temp dir as cwd and HOME, minimal environment (no API keys), isolated interpreter
+    - no network: a fresh network namespace via `unshare` where available, and the harness
+      disables `socket` before loading the solution (a best-effort guard the solution can undo,
+      so a missing `unshare` is warned about, or refused with SANDBOX_LOCAL_REQUIRE_NETNS=1)
+
+    The solution runs as the app's user without filesystem isolation: it can read any file
+    the app can (`.env`, the source tree). Use the docker backend for untrusted submissions.
+    """
+
+    name = "local"
+
+    def __init__(self):
+        try:
+            import resource  # noqa: F401
+        except ImportError:
+            raise RuntimeError("The local sandbox backend requires a POSIX system; use SANDBOX_BACKEND=docker.")
+        self.netns_prefix = self._probe_unshare()
+        if not self.netns_prefix:
+            message = ("`unshare --net` is not available: local sandbox network isolation is only a "
+                       "socket patch the solution can undo")
+            if LOCAL_REQUIRE_NETNS:
+                raise RuntimeError(f"{message}. Use SANDBOX_BACKEND=docker or unset SANDBOX_LOCAL_REQUIRE_NETNS.")
+            print(f"Warning: {message}.")
+
+    @staticmethod
+    def _probe_unshare() -> list:
+        prefix = ["unshare", "--net", "--map-root-user"]
+        if not shutil.which("unshare"):
+            return []
+        try:
+            probe = subprocess.run(prefix + ["true"], capture_output=True, timeout=5)
+            return prefix if probe.returncode == 0 else []
+        except (OSError, subprocess.SubprocessError):
+            return []
+
+    def execute(self, payload: dict) -> str:
+        work_dir = tempfile.mkdtemp(prefix="sandbox-")
+        try:
+            payload_path = os.path.join(work_dir, "payload.json")
+            with open(payload_path, "w", encoding="utf-8") as f:
+                json.dump({**payload, "block_network": True, "limits": {
+                    "cpu_seconds": math.ceil(hard_limit(payload)),
+                    "memory_bytes": LOCAL_MEMORY_BYTES,
+                    "file_bytes": LOCAL_FILE_BYTES,
+                    "max_processes": LOCAL_MAX_PROCESSES,
+                }}, f)
+
+            env = {"PATH": os.defpath, "HOME": work_dir, "TMPDIR": work_dir, "PYTHONIOENCODING": "utf-8"}
+            proc = subprocess.Popen(
+                self.netns_prefix + [sys.executable, "-I", "-S", HARNESS_PATH, payload_path],
+                cwd=work_dir,
+                env=env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                # No preexec_fn: forking from this multi-threaded process must not run Python code
+                start_new_session=True,
+            )
+            try:
+                stdout, stderr = proc.communicate(timeout=hard_limit(payload))
+            except subprocess.TimeoutExpired:
+                # The harness runs in its own session: kill it together with anything it spawned
+                os.killpg(proc.pid, signal.SIGKILL)
+                stdout, stderr = proc.communicate()
+                raise SandboxTimeout(stdout.decode(errors="replace") + stderr.decode(errors="replace"))
+            return stdout.decode(errors="replace") + stderr.decode(errors="replace")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+BACKENDS = {
+    "docker": DockerBackend,
+    "local": LocalBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> SandboxBackend:
+    """Return the process-wide backend selected by SANDBOX_BACKEND."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if BACKEND not in BACKENDS:
+                    raise ValueError(f"Unknown SANDBOX_BACKEND '{BACKEND}'. Choose one of: {', '.join(BACKENDS)}")
+                _backend = BACKENDS[BACKEND]()
+    return _backend
+
+
+def _split(indexes: list, parts: int) -> list:
+    """Split indexes into at most `parts` contiguous, near-equal shards."""
+    parts = max(1, min(parts, len(indexes)))
+    size, extra = divmod(len(indexes), parts)
+    shards, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        shards.append(indexes[start:end])
+        start = end
+    return shards
+
+
+_failures_lock = threading.Lock()
+
+
+def _is_failure(test: dict, case: dict) -> bool:
+    return case["status"] != "ok" or case["output"] != str(test["expected_output"])
+
+
+def _run_shard(code: str, testcases: list, session, case_timeout: float, deadline_at: float,
+               max_failures: int, failures: list) -> list:
+    """Run one shard; `failures` is a one-element counter shared by the shards of a submission."""
+    with governor.slot(session):
+        # Fail-fast and the submission deadline are checked again once a slot is granted
+        if max_failures and failures[0] >= max_failures:
+            return _error_results(len(testcases), f"Not run: stopped after {failures[0]} failure(s)", "skipped")
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            return _error_results(len(testcases), "Submission deadline exceeded", "timeout")
+
+        payload = build_payload(code, testcases, case_timeout, remaining, max_failures)
+        started = time.monotonic()
+        try:
+            output = get_backend().execute(payload)
+            case_results = parse_harness_output(output, len(testcases))
+            if all(case is None for case in case_results):
+                raise RuntimeError(f"Sandbox produced no results: {output.strip()[-500:]}")
+            # The harness died part-way (e.g. a resource limit): cases it never reported are errors
+            missing = _error_results(1, f"Sandbox stopped before this case finished: {output.strip()[-200:]}")[0]
+        except SandboxTimeout as e:
+            # Cases the harness reported before it was killed keep their results
+            case_results = parse_harness_output(e.output, len(testcases))
+            elapsed = round(time.monotonic() - started, 4)
+            missing = _error_results(1, f"Killed after {elapsed}s (submission deadline)", "timeout", elapsed)[0]
+        except Exception as e:
+            # The backend itself failed (Docker outage, no harness output): no verdict on the code
+            case_results = _error_results(len(testcases), str(e), "sandbox_error")
+            missing = None
+        case_results = [case if case is not None else dict(missing) for case in case_results]
+
+    failed = sum(_is_failure(test, case) for test, case in zip(testcases, case_results))
+    with _failures_lock:
+        failures[0] += failed
+    return case_results
+
+
+def run_tests(code: str, testcases: list, session=None, case_timeout: float = None,
+              submission_timeout: float = None, max_failures: int = None) -> dict:
+    """
+    Run the test cases of a submission in the configured backend.
+    Cases are sharded across up to PARALLELISM sandboxes that run concurrently,
+    each waiting for a slot from the process-wide governor. `session` identifies
+    the caller for fair queueing.
+
+    Each case is limited to `case_timeout` seconds and the whole submission to
+    `submission_timeout`; timed-out cases are reported with their elapsed time.
+    With `max_failures` set (fail-fast), grading stops after that many failures
+    and the remaining cases are reported as skipped.
+    """
+    if not testcases:
+        return summarize(testcases, [])
+
+    case_timeout = case_timeout or CASE_TIMEOUT
+    deadline_at = time.monotonic() + (submission_timeout or SUBMISSION_TIMEOUT)
+    failures = [0]
+    # Fail-fast only pays off if later cases can still be skipped, so keep it sequential
+    shards = _split(list(range(len(testcases))), 1 if max_failures else PARALLELISM)
+
+    def run_shard(shard):
+        return _run_shard(code, [testcases[i] for i in shard], session, case_timeout,
+                          deadline_at, max_failures, failures)
+
+    if len(shards) == 1:
+        return summarize(testcases, run_shard(shards[0]))
+
+    case_results = [None] * len(testcases)
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        futures = {executor.submit(run_shard, shard): shard for shard in shards}
+        for future, shard in futures.items():
+            for i, case in zip(shard, future.result()):
+                case_results[i] = case
+    return summarize(testcases, case_results)
@@ -0,0 +1,170 @@
+"""
+In-sandbox test harness.
+
+Loads the submitted `solution` once, runs every test case against it and prints
+one marked JSON line per case as soon as that case finishes, so a sandbox that
+is killed part-way still reports the cases it completed. Each case is isolated:
+an exception or a timeout in one case is recorded and the next case still runs.
+
+Optional limits:
+- deadline: wall-clock seconds for the whole run; cases left when it passes are reported as timeouts
+- max_failures: stop after this many failed cases (needs `expected_hashes`); the rest are reported as skipped
+- limits: rlimits applied before the solution is loaded (local backend; containers have their own)
+
+Usage: python Sandbox_Harness.py <payload.json>
+payload: {"code": str, "inputs": [str, ...], "expected_hashes": [str, ...], "salt": str, "case_timeout": float,
+          "deadline": float, "max_failures": int, "block_network": bool,
+          "limits": {"cpu_seconds": int, "memory_bytes": int, "file_bytes": int, "max_processes": int}}
+
+The solution runs in this process and can read the payload, so expected outputs are only
+sent as salted sha256 digests (see expected_hash); the host compares the real values.
+"""
+import hashlib
+import io
+import json
+import signal
+import sys
+import time
+from contextlib import redirect_stdout
+
+RESULT_MARKER = "__SANDBOX_RESULT__"
+
+
+class CaseTimeout(BaseException):
+    """Raised by the alarm handler; BaseException so `except Exception` in user code cannot swallow it."""
+
+
+def _on_alarm(signum, frame):
+    raise CaseTimeout()
+
+
+def expected_hash(salt: str, output: str) -> str:
+    return hashlib.sha256((salt + "\n" + output).encode("utf-8")).hexdigest()
+
+
+def _describe(e: BaseException) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+def _block_network():
+    """Best-effort guard for backends without network isolation of their own."""
+    import socket
+
+    def denied(*args, **kwargs):
+        raise OSError("Network access is disabled in the sandbox")
+
+    socket.socket = denied
+    socket.create_connection = denied
+    socket.getaddrinfo = denied
+
+
+def _emit(result: dict):
+    # Leading newline: the solution may have left a partial line on the real stdout
+    sys.stdout.write("\n" + RESULT_MARKER + json.dumps(result) + "\n")
+    sys.stdout.flush()
+
+
+def _apply_limits(limits: dict):
+    """rlimits for this process; set here rather than in the parent, which is multi-threaded."""
+    import resource
+    # CPU time is cumulative over all cases, so it is bounded by the hard deadline rather than per case
+    for name, key in (("RLIMIT_CPU", "cpu_seconds"), ("RLIMIT_AS", "memory_bytes"),
+                      ("RLIMIT_FSIZE", "file_bytes"), ("RLIMIT_NPROC", "max_processes")):
+        if limits.get(key):
+            value = int(limits[key])
+            resource.setrlimit(getattr(resource, name), (value, value + 1 if name == "RLIMIT_CPU" else value))
+
+
+def run(payload: dict, emit=_emit) -> list:
+    if payload.get("limits"):
+        _apply_limits(payload["limits"])
+    if payload.get("block_network"):
+        _block_network()
+
+    code = payload["code"]
+    inputs = payload["inputs"]
+    expected_hashes = payload.get("expected_hashes")
+    salt = payload.get("salt", "")
+    case_timeout = float(payload.get("case_timeout", 5))
+    deadline = payload.get("deadline")
+    max_failures = payload.get("max_failures")
+    signal.signal(signal.SIGALRM, _on_alarm)
+    started = time.perf_counter()
+
+    def time_left():
+        return None if deadline is None else deadline - (time.perf_counter() - started)
+
+    # Load the solution once; anything it prints at import time is part of every case's output
+    namespace = {"__name__": "__solution__"}
+    load_output = io.StringIO()
+    load_error = None
+    try:
+        signal.setitimer(signal.ITIMER_REAL, case_timeout)
+        with redirect_stdout(load_output):
+            exec(compile(code, "<solution>", "exec"), namespace)
+    except CaseTimeout:
+        load_error = f"Timed out loading solution after {case_timeout}s"
+    except BaseException as e:
+        load_error = _describe(e)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+    results = []
+    failures = 0
+
+    def record(result: dict):
+        results.append(result)
+        emit(result)
+
+    for index, test_input in enumerate(inputs):
+        if load_error:
+            record({"index": index, "status": "error", "output": "", "error": load_error, "elapsed": 0.0})
+            continue
+
+        if max_failures and failures >= max_failures:
+            record({"index": index, "status": "skipped", "output": "",
+                            "error": f"Not run: stopped after {failures} failure(s)", "elapsed": 0.0})
+            continue
+
+        remaining = time_left()
+        if remaining is not None and remaining <= 0:
+            failures += 1
+            record({"index": index, "status": "timeout", "output": "",
+                            "error": "Submission deadline exceeded", "elapsed": 0.0})
+            continue
+
+        limit = case_timeout if remaining is None else min(case_timeout, remaining)
+        output = io.StringIO()
+        status, error = "ok", None
+        start = time.perf_counter()
+        try:
+            signal.setitimer(signal.ITIMER_REAL, limit)
+            with redirect_stdout(output):
+                print(eval(f"solution({test_input})", namespace))
+        except CaseTimeout:
+            status = "timeout"
+            error = f"Timed out after {case_timeout}s" if limit == case_timeout else "Submission deadline exceeded"
+        except BaseException as e:
+            status, error = "error", _describe(e)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+        case_output = (load_output.getvalue() + output.getvalue()).strip()
+        if status != "ok" or (expected_hashes is not None
+                              and expected_hash(salt, case_output) != expected_hashes[index]):
+            failures += 1
+
+        record({
+            "index": index,
+            "status": status,
+            "output": case_output,
+            "error": error,
+            "elapsed": round(time.perf_counter() - start, 4),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    run(payload)
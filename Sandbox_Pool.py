@@ -0,0 +1,183 @@
+import io
+import tarfile
+import threading
+import time
+from collections import deque
+
+
+# Directories a submission running as `nobody` can write to; wiped on recycle, dotfiles included
+SCRATCH_DIRS = ["/tmp", "/var/tmp", "/dev/shm", "/run/lock"]
+
+
+def _tar_bytes(files: dict) -> bytes:
+    """Pack {path: bytes} into an in-memory tar archive for put_archive."""
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        for path, data in files.items():
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            info.mode = 0o644
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+class PooledContainer:
+    def __init__(self, container):
+        self.container = container
+        self.uses = 0
+        self.idle_since = time.monotonic()
+
+
+class ContainerPool:
+    """
+    Keeps `size` pre-started, network-disabled, memory-limited containers idle
+    and hands one to each submission.
+
+    Submissions run as `nobody` with the harness and payload under /sandbox.
+    After use a container is recycled in the background (user processes killed,
+    scratch files wiped) until it reaches `max_reuse` uses, then destroyed.
+    Idle containers older than `idle_ttl` seconds are destroyed as well, and a
+    maintenance thread keeps the idle set topped up.
+    """
+
+    def __init__(self, client, image: str, harness_source: bytes, size: int = 4,
+                 max_reuse: int = 20, idle_ttl: float = 300.0, run_kwargs: dict = None):
+        self.client = client
+        self.image = image
+        self.harness_source = harness_source
+        self.size = size
+        self.max_reuse = max_reuse
+        self.idle_ttl = idle_ttl
+        self.run_kwargs = run_kwargs or {}
+
+        self._idle = deque()
+        self._to_recycle = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self._worker = threading.Thread(target=self._maintain, name="sandbox-pool", daemon=True)
+        self._worker.start()
+
+    # === Public API ===
+    def run(self, payload: bytes, command: list) -> tuple:
+        """Copy `payload` to /sandbox/payload.json in a pooled container, run `command` and return (exit_code, output)."""
+        pooled = self._acquire()
+        healthy = False
+        try:
+            pooled.container.put_archive("/", _tar_bytes({"sandbox/payload.json": payload}))
+            exit_code, output = pooled.container.exec_run(command, user="nobody", workdir="/tmp")
+            healthy = True
+            return exit_code, output.decode(errors="replace")
+        finally:
+            self._release(pooled, healthy)
+
+    def shutdown(self):
+        """Stop maintenance and destroy every container owned by the pool."""
+        self._closed = True
+        self._wake.set()
+        with self._lock:
+            containers = list(self._idle) + list(self._to_recycle)
+            self._idle.clear()
+            self._to_recycle.clear()
+        for pooled in containers:
+            self._destroy(pooled)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"idle": len(self._idle), "recycling": len(self._to_recycle), "size": self.size}
+
+    # === Acquire / Release ===
+    def _acquire(self) -> PooledContainer:
+        with self._lock:
+            pooled = self._idle.popleft() if self._idle else None
+        self._wake.set()
+        # Pool drained by a burst: start one on demand rather than queueing behind the refill
+        return pooled or self._create()
+
+    def _release(self, pooled: PooledContainer, healthy: bool):
+        pooled.uses += 1
+        if not healthy or pooled.uses >= self.max_reuse or self._closed:
+            threading.Thread(target=self._destroy, args=(pooled,), daemon=True).start()
+            return
+        with self._lock:
+            self._to_recycle.append(pooled)
+        self._wake.set()
+
+    # === Container Lifecycle ===
+    def _create(self) -> PooledContainer:
+        container = self.client.containers.run(
+            image=self.image,
+            command=["sleep", "infinity"],
+            detach=True,
+            labels={"intelligent-evaluator": "sandbox-pool"},
+            **self.run_kwargs,
+        )
+        container.put_archive("/", _tar_bytes({"sandbox/harness.py": self.harness_source}))
+        return PooledContainer(container)
+
+    def _recycle(self, pooled: PooledContainer) -> bool:
+        """Remove every trace of the previous submission; False if the container must be dropped."""
+        try:
+            # `kill -1` as nobody signals every process the submission may have left behind
+            pooled.container.exec_run(["sh", "-c", "kill -9 -1"], user="nobody")
+            exit_code, _ = pooled.container.exec_run(["sh", "-c", "rm -rf /sandbox/payload.json " + " ".join(
+                f"{d}/* {d}/.[!.]*" for d in SCRATCH_DIRS
+            )])
+            return exit_code == 0
+        except Exception as e:
+            print(f"Sandbox recycle failed: {e}")
+            return False
+
+    def _destroy(self, pooled: PooledContainer):
+        try:
+            pooled.container.remove(force=True)
+        except Exception as e:
+            print(f"Sandbox removal failed: {e}")
+
+    def _maintain(self):
+        while not self._closed:
+            self._wake.wait(timeout=1.0)
+            self._wake.clear()
+            try:
+                self._drain_recycle_queue()
+                self._evict_expired()
+                self._refill()
+            except Exception as e:
+                # Docker hiccups must not kill the maintenance thread
+                print(f"Sandbox pool maintenance failed: {e}")
+                time.sleep(1.0)
+
+    def _drain_recycle_queue(self):
+        while True:
+            with self._lock:
+                if not self._to_recycle:
+                    return
+                pooled = self._to_recycle.popleft()
+                full = len(self._idle) >= self.size
+            # Containers started on demand during a burst are not kept beyond `size`
+            if not full and self._recycle(pooled):
+                pooled.idle_since = time.monotonic()
+                with self._lock:
+                    self._idle.append(pooled)
+            else:
+                self._destroy(pooled)
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [p for p in self._idle if now - p.idle_since > self.idle_ttl]
+            for pooled in expired:
+                self._idle.remove(pooled)
+        for pooled in expired:
+            self._destroy(pooled)
+
+    def _refill(self):
+        while not self._closed:
+            with self._lock:
+                if len(self._idle) >= self.size:
+                    return
+            pooled = self._create()
+            with self._lock:
+                self._idle.append(pooled)
@@ -0,0 +1,73 @@
+from collections import Counter
+
+
+# === Local Adaptive Scheduler ===
+# Deterministic replacement for the LLM routing call: picks tags, type and
+# difficulty from the beliefs in microseconds.
+TYPE_SHARES = {"MCQ": 0.5, "ShortAnswer": 0.2, "Coding": 0.2}
+# A second tag is combined into the question when it is nearly as uncertain as the first
+PAIR_RATIO = 0.8
+
+
+def type_quotas(max_questions: int) -> dict:
+    """Questions per type for the whole test, from TYPE_SHARES (largest remainder rounding)."""
+    total_share = sum(TYPE_SHARES.values())
+    exact = {t: share / total_share * max_questions for t, share in TYPE_SHARES.items()}
+    quotas = {t: int(value) for t, value in exact.items()}
+    leftover = max_questions - sum(quotas.values())
+    for t in sorted(exact, key=lambda t: exact[t] - quotas[t], reverse=True)[:leftover]:
+        quotas[t] += 1
+    return quotas
+
+
+def choose_type(asked_types: list, max_questions: int) -> str:
+    """The type furthest behind its quota at this point of the test."""
+    counts = Counter(asked_types)
+    quotas = type_quotas(max_questions)
+    position = len(asked_types) + 1
+    open_types = [t for t in TYPE_SHARES if counts[t] < quotas[t]] or list(TYPE_SHARES)
+    return max(open_types, key=lambda t: quotas[t] * position / max_questions - counts[t])
+
+
+def uncertainty(belief: float, n: int) -> float:
+    """Variance of the running-mean belief: highest for untested tags near 0.5."""
+    return belief * (1 - belief) / max(n, 1)
+
+
+def choose_tags(tags: list, beliefs: dict, question_counts: dict) -> list:
+    """The most uncertain tag, plus the runner-up when it is almost as uncertain."""
+    ranked = sorted(
+        tags,
+        key=lambda tag: uncertainty(beliefs.get(tag, 0.5), question_counts.get(tag, 1)),
+        reverse=True,
+    )
+    if not ranked:
+        return []
+    chosen = ranked[:1]
+    if len(ranked) > 1:
+        top = uncertainty(beliefs.get(ranked[0], 0.5), question_counts.get(ranked[0], 1))
+        second = uncertainty(beliefs.get(ranked[1], 0.5), question_counts.get(ranked[1], 1))
+        if top and second >= PAIR_RATIO * top:
+            chosen.append(ranked[1])
+    return chosen
+
+
+def choose_difficulty(beliefs: dict, tags: list) -> str:
+    """Easier questions for weak tags, harder ones once the belief is high."""
+    belief = sum(beliefs.get(tag, 0.5) for tag in tags) / len(tags) if tags else 0.5
+    if belief < 0.4:
+        return "easy"
+    if belief < 0.7:
+        return "medium"
+    return "hard"
+
+
+def choose_next_question(tags: list, beliefs: dict, asked_types: list, max_questions: int,
+                         question_counts: dict = None) -> dict:
+    """Same shape as the LLM routing decision: {"tags": [...], "type": ..., "difficulty": ...}."""
+    chosen = choose_tags(tags, beliefs, question_counts or {})
+    return {
+        "tags": chosen,
+        "type": choose_type(asked_types, max_questions),
+        "difficulty": choose_difficulty(beliefs, chosen),
+    }
@@ -0,0 +1,220 @@
+import hashlib
+import ipaddress
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+
+# === Scrape Cache Settings ===
+# Scraped page texts are kept on disk so repeated quiz generations from the
+# same URLs skip Firecrawl. Entries older than the TTL are revalidated
+# against the origin with If-None-Match / If-Modified-Since when it sent
+# validators; a 304 keeps the cached text without a new scrape.
+ENABLED = os.getenv("SCRAPE_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+CACHE_PATH = os.getenv("SCRAPE_CACHE_PATH", os.path.join(".cache", "scrape_cache.sqlite3"))
+TTL_SECONDS = float(os.getenv("SCRAPE_CACHE_TTL", str(24 * 3600)))
+MAX_BYTES = int(float(os.getenv("SCRAPE_CACHE_MAX_MB", "200")) * 1024 * 1024)
+REVALIDATE_TIMEOUT = 5
+# URLs come from users: direct origin requests only go to hosts that resolve to public
+# addresses, and redirects are followed by hand so every hop is checked the same way
+MAX_REDIRECTS = 5
+
+# Query parameters that never change page content
+TRACKING_PREFIX = "utm_"
+TRACKING_PARAMS = {"fbclid", "gclid"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url_key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    content BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages (accessed_at);
+"""
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL: lowercase scheme/host, no default port, fragment or tracking params, sorted query."""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PREFIX) and key.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def url_key(url: str) -> str:
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+
+def is_public_host(host: str) -> bool:
+    """True if every address `host` resolves to is globally routable (no private, loopback, link-local)."""
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except (OSError, UnicodeError):
+        return False
+    try:
+        return bool(addresses) and all(ipaddress.ip_address(a.split("%", 1)[0]).is_global for a in addresses)
+    except ValueError:
+        return False
+
+
+def _origin_request(session, method: str, url: str, headers: dict = None):
+    """A direct request to a page's origin, or None if it (or a redirect hop) is not a public http(s) host."""
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname or not is_public_host(parts.hostname):
+            return None
+        response = session.request(method, url, headers=headers, stream=True, allow_redirects=False,
+                                   timeout=REVALIDATE_TIMEOUT)
+        response.close()
+        if not response.is_redirect:
+            return response
+        url = urljoin(url, response.headers["Location"])
+    return None
+
+
+def origin_validators(url: str, session) -> dict:
+    """ETag / Last-Modified the origin sends for `url` (best effort, {} on any failure)."""
+    try:
+        response = _origin_request(session, "HEAD", url)
+    except Exception:
+        return {}
+    if response is None:
+        return {}
+    return {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+
+def revalidate(entry: dict, session) -> bool:
+    """True if the origin confirms (304) that a stale entry is still current."""
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    if not headers:
+        return False
+    try:
+        response = _origin_request(session, "GET", entry["url"], headers)
+    except Exception:
+        return False
+    return response is not None and response.status_code == 304
+
+
+class ScrapeCache:
+    """SQLite store of zlib-compressed page texts keyed by normalized URL, LRU-evicted to MAX_BYTES."""
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = TTL_SECONDS, max_bytes: int = MAX_BYTES,
+                 enabled: bool = ENABLED):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._local = threading.local()
+        self._evict_lock = threading.Lock()
+        if enabled:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, url: str):
+        """{"url", "content", "etag", "last_modified", "fetched_at", "fresh"} or None."""
+        if not self.enabled:
+            return None
+        conn = self._connect()
+        key = url_key(url)
+        row = conn.execute(
+            "SELECT url, content, etag, last_modified, fetched_at FROM pages WHERE url_key = ?", (key,)
+        ).fetchone()
+        if not row:
+            return None
+        conn.execute("UPDATE pages SET accessed_at = ? WHERE url_key = ?", (time.time(), key))
+        return {
+            "url": row[0],
+            "content": zlib.decompress(row[1]).decode("utf-8"),
+            "etag": row[2],
+            "last_modified": row[3],
+            "fetched_at": row[4],
+            "fresh": time.time() - row[4] < self.ttl,
+        }
+
+    def put(self, url: str, content: str, etag: str = None, last_modified: str = None):
+        if not self.enabled:
+            return
+        blob = zlib.compress(content.encode("utf-8"), 9)
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO pages (url_key, url, content, size, etag, last_modified, fetched_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url_key(url), url, blob, len(blob), etag, last_modified, now, now),
+        )
+        self._evict()
+
+    def set_validators(self, url: str, etag: str = None, last_modified: str = None):
+        """Attach the origin's validators to an entry stored without them."""
+        if self.enabled and (etag or last_modified):
+            self._connect().execute(
+                "UPDATE pages SET etag = ?, last_modified = ? WHERE url_key = ?", (etag, last_modified, url_key(url))
+            )
+
+    def touch(self, url: str):
+        """Restart the TTL of an entry the origin confirmed unchanged."""
+        if self.enabled:
+            self._connect().execute("UPDATE pages SET fetched_at = ? WHERE url_key = ?", (time.time(), url_key(url)))
+
+    def _evict(self):
+        """Drop least recently used pages until the stored size fits in max_bytes."""
+        with self._evict_lock:
+            conn = self._connect()
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, size in conn.execute("SELECT url_key, size FROM pages ORDER BY accessed_at").fetchall():
+                conn.execute("DELETE FROM pages WHERE url_key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        entries, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {"enabled": True, "entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_scrape_cache() -> ScrapeCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ScrapeCache()
+    return _cache
@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+
+# Settings of the modules below are read at import time
+load_dotenv()
+from Actions import _question_prompt, extract_json, query_llm, validate_question
+from Question_Bank import get_question_bank, tags_key, topic_key
+from Sandbox import run_tests
+
+
+# === Offline Coding Question Validation ===
+# Generates Coding questions together with a reference solution, runs the
+# solution against the question's own test cases in the sandbox, and stores
+# only the questions whose tests all pass in the question bank, where the
+# student flow serves them without a generation call. Every finished job is
+# appended to a JSONL journal, so an interrupted run resumes where it stopped.
+#
+#   python Validate_Coding_Questions.py --topic Python --tags "Lists,Loops" --tags Recursion \
+#       --difficulty easy --difficulty medium --count 10 [--workers 4]
+#
+# The student flow only serves a stored question for the exact topic and tag set it
+# asks for (tags come from generate_tags() for the student's topic), and only once
+# QUESTION_BANK_MIN_UNSEEN unseen ones exist, so tag sets should match those tags.
+JOURNAL_PATH = os.getenv("CODING_VALIDATION_JOURNAL", os.path.join(".cache", "coding_validation.jsonl"))
+VALIDATION_WORKERS = int(os.getenv("CODING_VALIDATION_WORKERS", "4"))
+DIFFICULTIES = ["easy", "medium", "hard"]
+# Sandbox queue of this job, so the governor keeps serving live student sessions fairly alongside it
+SANDBOX_SESSION = "offline-validation"
+# Questions already stored for the same tags/difficulty that the prompt asks the LLM not to repeat
+AVOID_RECENT = 10
+# Jobs with these statuses are final; "error" jobs (LLM, parsing or sandbox infrastructure failures)
+# are retried on resume, and "validated" ones (passed, not yet confirmed stored) are stored again
+DONE_STATUSES = ("passed", "failed", "invalid")
+
+
+def _validation_prompt(topic: str, tags: list, difficulty: str, avoid: list) -> str:
+    prompt = _question_prompt(tags, "Coding", difficulty).rstrip()
+    prompt += f"""
+
+The topics are subtopics of: {topic}"""
+    prompt += """
+
+Also add a key "reference_solution" to the object: complete Python source defining a function
+`solution` that takes each test case's input and returns its expected_output. Every test case
+must pass against it.
+"""
+    if avoid:
+        listed = "\n".join(f"- {question}" for question in avoid)
+        prompt += f"\nAsk a different problem from these existing questions:\n{listed}\n"
+    return prompt
+
+
+def load_journal(path: str) -> dict:
+    """Last journal entry per job key (a truncated last line from an interrupted run is ignored)."""
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries[entry["job"]] = entry
+    return entries
+
+
+def _job_prefix(topic: str, tags: list, difficulty: str) -> str:
+    return f"{topic_key(topic)}|{tags_key(tags)}|{difficulty}|"
+
+
+def plan_jobs(topic: str, tag_sets: list, difficulties: list, count: int) -> list:
+    """[(job key, tags, difficulty)]; keys are stable across runs so finished jobs can be skipped."""
+    return [
+        (f"{_job_prefix(topic, tags, difficulty)}{i}", tags, difficulty)
+        for tags in tag_sets
+        for difficulty in difficulties
+        for i in range(count)
+    ]
+
+
+class ValidationJournal:
+    """Append-only JSONL record of finished jobs, shared by the worker threads."""
+
+    def __init__(self, path: str = JOURNAL_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.entries = load_journal(path)
+        self._lock = threading.Lock()
+
+    def done(self, key: str) -> bool:
+        return self.entries.get(key, {}).get("status") in DONE_STATUSES
+
+    def recent_questions(self, topic: str, tags: list, difficulty: str) -> list:
+        prefix = _job_prefix(topic, tags, difficulty)
+        with self._lock:
+            return [
+                entry["question"] for key, entry in self.entries.items()
+                if key.startswith(prefix) and entry.get("status") in ("passed", "validated")
+            ][-AVOID_RECENT:]
+
+    def record(self, entry: dict):
+        with self._lock:
+            self.entries[entry["job"]] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+def _infrastructure_failure(result: dict) -> bool:
+    """
+    True when the sandbox gave no real verdict: the backend failed (Docker outage, no harness
+    output) rather than the reference solution. Such jobs are retried on resume rather than
+    discarded; a solution that raises, times out or returns a wrong output is a real failure.
+    """
+    if not result["total"]:
+        return True
+    return any(detail.get("sandbox_error") for detail in result["details"])
+
+
+def store(entry: dict) -> dict:
+    """Add a validated question to the bank; idempotent, so a resumed job can store it again."""
+    question = entry["stored_question"]
+    bank_id = get_question_bank().add(entry["tags"], "Coding", entry["difficulty"], question, topic=entry["topic"])
+    return {**{k: v for k, v in entry.items() if k != "stored_question"}, "status": "passed", "bank_id": bank_id}
+
+
+def validate_one(key: str, topic: str, tags: list, difficulty: str, journal: ValidationJournal) -> dict:
+    """Generate, sandbox-check and (if every test passes) store one Coding question; returns its journal entry."""
+    entry = {"job": key, "topic": topic, "tags": tags, "difficulty": difficulty}
+    start = time.perf_counter()
+    try:
+        avoid = journal.recent_questions(topic, tags, difficulty)
+        question = extract_json(query_llm(_validation_prompt(topic, tags, difficulty, avoid)))
+        entry["generate_seconds"] = round(time.perf_counter() - start, 3)
+    except Exception as e:
+        return {**entry, "status": "error", "error": str(e)}
+
+    try:
+        validate_question(question, "Coding")
+        reference = question.pop("reference_solution", None)
+        if not isinstance(reference, str) or "def solution" not in reference:
+            raise ValueError("reference_solution with a `solution` function is missing.")
+    except ValueError as e:
+        return {**entry, "status": "invalid", "error": str(e)}
+    entry["question"] = question["question"]
+
+    sandbox_start = time.perf_counter()
+    # Same run as Actions.run_code_in_sandbox(), fail-fast since only the verdict matters
+    result = run_tests(reference, question["test_cases"], session=SANDBOX_SESSION, max_failures=1)
+    entry["sandbox_seconds"] = round(time.perf_counter() - sandbox_start, 3)
+    entry["tests"] = result["total"]
+    if result["failed"] or result["passed"] != result["total"]:
+        if _infrastructure_failure(result):
+            return {**entry, "status": "error", "error": f"No sandbox verdict: {result['details'][:1]}"}
+        return {**entry, "status": "failed", "reference_solution": reference, "details": result["details"][:1]}
+
+    # Journaled before the bank insert: a crash in between is resumed by storing this exact
+    # question (the insert is idempotent) instead of generating and storing a new one.
+    # The reference solution stays in the journal only; bank questions are shown to students as they are
+    validated = {**entry, "status": "validated", "reference_solution": reference, "stored_question": question}
+    journal.record(validated)
+    return store(validated)
+
+
+def run(topic: str, tag_sets: list, difficulties: list, count: int, workers: int = VALIDATION_WORKERS,
+        journal_path: str = JOURNAL_PATH) -> dict:
+    """Run every job not already finished in the journal; returns throughput and pass-rate figures."""
+    if get_question_bank() is None:
+        raise RuntimeError("The question bank is disabled (QUESTION_BANK=0); nothing to write validated questions to.")
+    journal = ValidationJournal(journal_path)
+    jobs = plan_jobs(topic, tag_sets, difficulties, count)
+
+    # Validated before an interruption but maybe not stored: store them, no new generation
+    restored = 0
+    for key, _, _ in jobs:
+        if journal.entries.get(key, {}).get("status") == "validated":
+            journal.record(store(journal.entries[key]))
+            restored += 1
+
+    pending = [job for job in jobs if not journal.done(job[0])]
+    print(f"{len(jobs)} jobs, {len(jobs) - len(pending)} already done ({restored} stored from the journal), "
+          f"{len(pending)} to run")
+
+    statuses = {status: 0 for status in ("passed", "failed", "invalid", "error")}
+    generate_seconds, sandbox_seconds = [], []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="validate") as executor:
+        futures = [executor.submit(validate_one, key, topic, tags, difficulty, journal)
+                   for key, tags, difficulty in pending]
+        for finished, future in enumerate(as_completed(futures), 1):
+            entry = future.result()
+            journal.record(entry)
+            statuses[entry["status"]] += 1
+            if "generate_seconds" in entry:
+                generate_seconds.append(entry["generate_seconds"])
+            if "sandbox_seconds" in entry:
+                sandbox_seconds.append(entry["sandbox_seconds"])
+            elapsed = time.perf_counter() - start
+            print(f"[{finished}/{len(pending)}] {entry['job']}: {entry['status']}"
+                  f"{' - ' + entry['error'] if entry.get('error') else ''} ({finished / elapsed * 60:.1f} jobs/min)")
+
+    elapsed = time.perf_counter() - start
+    checked = statuses["passed"] + statuses["failed"]
+    return {
+        "jobs": len(pending),
+        "skipped": len(jobs) - len(pending),
+        **statuses,
+        "pass_rate": statuses["passed"] / checked if checked else 0.0,
+        "seconds": elapsed,
+        "jobs_per_minute": len(pending) / elapsed * 60 if elapsed else 0.0,
+        "stored_per_minute": statuses["passed"] / elapsed * 60 if elapsed else 0.0,
+        "mean_generate_seconds": sum(generate_seconds) / len(generate_seconds) if generate_seconds else 0.0,
+        "mean_sandbox_seconds": sum(sandbox_seconds) / len(sandbox_seconds) if sandbox_seconds else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate Coding questions and keep only those whose reference solution passes.")
+    parser.add_argument("--topic", required=True, help="subject the student flow is started with, e.g. Python")
+    parser.add_argument("--tags", action="append", required=True,
+                        help="comma-separated tags of one question set (repeat for several sets)")
+    parser.add_argument("--difficulty", action="append", choices=DIFFICULTIES,
+                        help="difficulty to generate (repeatable, default: all)")
+    parser.add_argument("--count", type=int, default=5, help="questions attempted per tag set and difficulty")
+    parser.add_argument("--workers", type=int, default=VALIDATION_WORKERS, help="questions generated/validated at once")
+    parser.add_argument("--journal", default=JOURNAL_PATH, help="JSONL journal used to resume an interrupted run")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    tag_sets = [[tag.strip() for tag in tags.split(",") if tag.strip()] for tags in args.tags]
+    report = run(args.topic, tag_sets, args.difficulty or DIFFICULTIES, args.count, args.workers, args.journal)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"\nran {report['jobs']} jobs in {report['seconds']:.1f}s ({report['skipped']} skipped from the journal)")
+    print(f"passed {report['passed']}, failed {report['failed']}, invalid {report['invalid']}, errors {report['error']}"
+          f" - pass rate {report['pass_rate']:.0%}")
+    print(f"throughput: {report['jobs_per_minute']:.1f} jobs/min, {report['stored_per_minute']:.1f} stored questions/min")
+    print(f"mean per question: generation {report['mean_generate_seconds']:.2f}s, sandbox {report['mean_sandbox_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()